@@ -28,18 +28,140 @@ loses connection with the API or fails to log into the cluster.
 
 
 import argparse
+import datetime
+import hashlib
+import html
+import http.server
 import json
 import os
+import mmap
 import smtplib
 import socket
+import socketserver
+import struct
 import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+import zlib
 
 from email.mime.text import MIMEText
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    NoReturn,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 from qumulo.rest_client import RestClient
+from qumulo.lib.auth import Credentials
 from qumulo.lib.request import RequestError
 
+# Snapshot file names, keyed by --snapshot-format: (current, previous)
+SNAPSHOT_FILES = {
+    'json': ('cluster_status.json', 'cluster_status_previous.json'),
+    'compact': ('cluster_status.snap', 'cluster_status_previous.snap'),
+}
+
+# Bearer tokens from previous logins, reused by later runs until the cluster
+# rejects them. Only readable by the owner.
+TOKEN_CACHE_FILE = 'session_token_cache.json'
+
+# Compact snapshot layout: magic, then one record per device. Each record is a
+# header (device kind, payload length, CRC32 of payload) followed by the device
+# encoded as compact JSON.
+SNAPSHOT_MAGIC = b'QCDMSNAP1\n'
+SNAPSHOT_RECORD_HEADER = struct.Struct('>cII')
+SNAPSHOT_KINDS = {b'N': 'nodes', b'D': 'drives'}
+
+# Default bounds, in seconds, for the adaptive polling interval in --daemon mode
+DEFAULT_POLL_INTERVAL_MIN = 60
+DEFAULT_POLL_INTERVAL_MAX = 900
+
+# Write-ahead journal of event alert emails: one JSON entry per line, 'pending'
+# before delivery and 'done' after it
+ALERT_JOURNAL_FILE = 'alert_journal.jsonl'
+# Seconds between compactions of the alert journal in --daemon mode
+JOURNAL_COMPACT_INTERVAL = 3600
+# Bounds, in seconds, of the back-off between attempts to resend a journaled alert
+JOURNAL_RETRY_MIN = 60
+JOURNAL_RETRY_MAX = 3600
+# Seconds to wait for the SMTP server before giving up on an email
+SMTP_TIMEOUT = 30
+
+# Rolling per-drive, per-node and per-disk-model aggregates kept by --trends
+TRENDS_FILE = 'device_trends.json'
+# Seconds in each window of drive failures; a drive is reported as rising when it
+# failed more often in the latest window than in the one before
+TREND_WINDOW = 7 * 24 * 60 * 60
+# Number of unhealthy slots at which a node is reported as degraded
+DEGRADED_NODE_SLOTS = 2
+
+# Rules used when the config has no health_rules. Each rule matches devices whose
+# fields satisfy every 'match' condition and no 'exclude' condition. A condition
+# is a value, a list of values, {"in": [...]} or {"not_in": [...]}.
+DEFAULT_HEALTH_RULES: List[Dict[str, Any]] = [
+    {
+        'name': 'node offline',
+        'devices': 'nodes',
+        'severity': 'critical',
+        'match': {'node_status': {'not_in': ['online']}},
+    },
+    {
+        'name': 'drive unhealthy',
+        'devices': 'drives',
+        'severity': 'critical',
+        'match': {'state': {'not_in': ['healthy']}},
+    },
+]
+# Devices matching only 'info' rules do not make the cluster unhealthy
+SEVERITY_LEVELS = {'info': 0, 'warning': 1, 'critical': 2}
+HEALTH_RULE_FIELDS = {'name', 'devices', 'severity', 'match', 'exclude'}
+
+# Characters that may not appear in a cluster_name, which prefixes its status files
+PATH_SEPARATORS = {'/', '\\', '\0', os.sep} | ({os.altsep} if os.altsep else set())
+
+# Seconds between checks of the config file for changes in --daemon mode
+CONFIG_RELOAD_INTERVAL = 10
+# Cluster settings that, when changed, need a new session in --daemon mode
+CONNECTION_SETTINGS = (
+    'cluster_address',
+    'rest_port',
+    'username',
+    'password',
+    'access_token',
+)
+
+# Expected type of every config element. cluster_settings may also be a list of
+# objects, one per cluster to monitor.
+CONFIG_SCHEMA: Dict[str, Dict[str, type]] = {
+    'cluster_settings': {
+        'cluster_address': str,
+        'cluster_name': str,
+        'username': str,
+        'rest_port': int,
+    },
+    'email_settings': {
+        'sender': str,
+        'server': str,
+        'mail_to': list,
+    },
+}
+OPTIONAL_CLUSTER_SETTINGS: Dict[str, type] = {
+    'password': str,
+    'access_token': str,
+    'poll_interval_min': int,
+    'poll_interval_max': int,
+}
+
 #   ____ _        _    ____ ____  _____ ____
 #  / ___| |      / \  / ___/ ___|| ____/ ___|
 # | |   | |     / _ \ \___ \___ \|  _| \___ \
@@ -47,6 +169,57 @@ from qumulo.lib.request import RequestError
 #  \____|_____/_/   \_\____/____/|_____|____/
 
 
+class ClusterProblem(SystemExit):
+    """
+    Raised once a problem with a cluster has been reported. It ends the script like
+    sys.exit in cron mode, while --daemon mode catches it and keeps polling.
+    """
+
+
+class HealthRule:
+    """
+    A compiled health rule. Conditions are (field, values, negate) tuples with the
+    values stringified once so matching a device is a set lookup per condition.
+    """
+    name: str
+    device_type: str
+    severity: str
+    match: List[Tuple[str, FrozenSet[str], bool]]
+    exclude: List[Tuple[str, FrozenSet[str], bool]]
+
+    def __init__(
+        self,
+        name: str,
+        device_type: str,
+        severity: str,
+        match: List[Tuple[str, FrozenSet[str], bool]],
+        exclude: List[Tuple[str, FrozenSet[str], bool]],
+    ):
+        self.name = name
+        self.device_type = device_type
+        self.severity = severity
+        self.match = match
+        self.exclude = exclude
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, HealthRule) and vars(self) == vars(other)
+
+    # Compared by value, so deliberately unhashable
+    __hash__ = None  # type: ignore
+
+    def matches(self, device: Dict[str, Any]) -> bool:
+        """
+        Check whether a device satisfies every match and no exclude condition.
+        """
+        return all(
+            (str(device.get(field)) in values) != negate
+            for field, values, negate in self.match
+        ) and not any(
+            (str(device.get(field)) in values) != negate
+            for field, values, negate in self.exclude
+        )
+
+
 class ConfigData:
     """
     Data for config file.
@@ -54,22 +227,32 @@ class ConfigData:
     cluster_address: str
     cluster_name: str
     username: str
-    password: str
+    password: Optional[str]
     rest_port: int
     sender: str
     server: str
     mail_to: List[str]
+    poll_interval_min: int
+    poll_interval_max: int
+    status_prefix: str
+    access_token: Optional[str]
+    health_rules: Dict[str, List[HealthRule]]
 
     def __init__(
         self,
         cluster_address: str,
         cluster_name: str,
         username: str,
-        password: str,
+        password: Optional[str],
         rest_port: int,
         sender: str,
         server: str,
-        mail_to: List[str]
+        mail_to: List[str],
+        poll_interval_min: int = DEFAULT_POLL_INTERVAL_MIN,
+        poll_interval_max: int = DEFAULT_POLL_INTERVAL_MAX,
+        status_prefix: str = '',
+        access_token: Optional[str] = None,
+        health_rules: Optional[Dict[str, List[HealthRule]]] = None,
     ):
         self.cluster_address = cluster_address
         self.cluster_name = cluster_name
@@ -79,6 +262,644 @@ class ConfigData:
         self.sender = sender
         self.server = server
         self.mail_to = mail_to
+        self.poll_interval_min = poll_interval_min
+        self.poll_interval_max = poll_interval_max
+        self.status_prefix = status_prefix
+        self.access_token = access_token
+        self.health_rules = (
+            health_rules if health_rules is not None else DEFAULT_COMPILED_HEALTH_RULES
+        )
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ConfigData) and vars(self) == vars(other)
+
+    # Compared by value to detect changed settings on reload, so deliberately
+    # unhashable; key collections of ConfigData by cluster_name instead
+    __hash__ = None  # type: ignore
+
+
+class PollScheduler:
+    """
+    Adaptive polling interval for a single cluster.
+
+    The interval tightens to the minimum while devices are unhealthy, the status
+    changed, or the cluster recovered within the last few polls. Otherwise it
+    doubles after every poll until it reaches the maximum.
+    """
+    min_interval: int
+    max_interval: int
+    recovery_polls: int
+    interval: int
+
+    def __init__(self, min_interval: int, max_interval: int, recovery_polls: int = 3):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.recovery_polls = recovery_polls
+        self.interval = min_interval
+        self._polls_since_unhealthy = recovery_polls
+
+    def next_interval(self, healthy: bool, changed: bool) -> int:
+        """
+        Record the outcome of a poll and return the seconds to wait before the next.
+        """
+        if not healthy:
+            self._polls_since_unhealthy = 0
+            self.interval = self.min_interval
+        elif changed or self._polls_since_unhealthy < self.recovery_polls:
+            self._polls_since_unhealthy += 1
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+
+        return self.interval
+
+
+class DeviceTrends:
+    """
+    Rolling health aggregates folded in from every poll.
+
+    Each drive, node and disk model keeps a fixed set of counters, so memory stays
+    constant per device no matter how many polls are folded in. Drives and nodes
+    are keyed by cluster name so one instance can cover the whole fleet, and are
+    evicted once they no longer appear in their cluster or the cluster is removed.
+
+    Drive failures are counted per TREND_WINDOW, and disk model health is weighted
+    by the time between polls, so polling an unhealthy cluster more often does not
+    skew either of them.
+    """
+    drives: Dict[str, Dict[str, Any]]
+    nodes: Dict[str, Dict[str, Any]]
+    models: Dict[str, Dict[str, float]]
+    clusters: Dict[str, float]
+    findings: List[str]
+
+    def __init__(
+        self,
+        drives: Optional[Dict[str, Dict[str, Any]]] = None,
+        nodes: Optional[Dict[str, Dict[str, Any]]] = None,
+        models: Optional[Dict[str, Dict[str, float]]] = None,
+        clusters: Optional[Dict[str, float]] = None,
+        findings: Optional[List[str]] = None,
+    ):
+        self.drives = drives if drives is not None else {}
+        self.nodes = nodes if nodes is not None else {}
+        self.models = models if models is not None else {}
+        self.clusters = clusters if clusters is not None else {}
+        self.findings = findings if findings is not None else []
+
+    def fold(
+        self,
+        cluster_name: str,
+        cluster_status: Dict[str, Any],
+        now: Optional[float] = None,
+    ) -> None:
+        """
+        Fold one poll of a cluster into the aggregates. The state each drive had at
+        the previous poll is taken to have held until this one.
+        """
+        now = time.time() if now is None else now
+        elapsed = max(0.0, now - self.clusters.get(cluster_name, now))
+        self.clusters[cluster_name] = now
+        degraded_slots: Dict[str, int] = {}
+        seen_drives = set()
+
+        for drive in cluster_status['drives']:
+            healthy = drive.get('state') == 'healthy'
+            node_key = f"{cluster_name}/{drive.get('node_id')}"
+            model = drive.get('disk_model') or 'unknown'
+            drive_key = f"{cluster_name}/{drive.get('id')}"
+            seen_drives.add(drive_key)
+            stats = self.drives.get(drive_key)
+            model_stats = self.models.setdefault(
+                model,
+                {'drive_seconds': 0.0, 'unhealthy_drive_seconds': 0.0, 'failures': 0},
+            )
+
+            if stats is None:
+                stats = self.drives[drive_key] = {
+                    'failures': 0,
+                    'recent_failures': 0,
+                    'older_failures': 0,
+                    'window_start': now,
+                    'healthy': True,
+                }
+            else:
+                model_stats['drive_seconds'] += elapsed
+                if not stats['healthy']:
+                    model_stats['unhealthy_drive_seconds'] += elapsed
+            roll_failure_window(stats, now)
+            if stats['healthy'] and not healthy:
+                stats['failures'] += 1
+                stats['recent_failures'] += 1
+                model_stats['failures'] += 1
+            stats['healthy'] = healthy
+            stats['node'] = node_key
+            stats['disk_model'] = model
+
+            degraded_slots.setdefault(node_key, 0)
+            if not healthy:
+                degraded_slots[node_key] += 1
+
+        for node_key, slots in degraded_slots.items():
+            self.nodes[node_key] = {'degraded_slots': slots}
+
+        prefix = f'{cluster_name}/'
+        seen_nodes = degraded_slots.keys()
+        for aggregates, seen in ((self.drives, seen_drives), (self.nodes, seen_nodes)):
+            for key in [key for key in aggregates if key.startswith(prefix)]:
+                if key not in seen:
+                    del aggregates[key]
+
+    def retain_clusters(self, cluster_names: Sequence[str]) -> None:
+        """
+        Evict the drives and nodes of clusters that are no longer monitored.
+        """
+        keep = set(cluster_names)
+        for aggregates in (self.drives, self.nodes):
+            for key in [key for key in aggregates if key.split('/', 1)[0] not in keep]:
+                del aggregates[key]
+        for cluster_name in [name for name in self.clusters if name not in keep]:
+            del self.clusters[cluster_name]
+
+    def report(self) -> Dict[str, str]:
+        """
+        Describe rising drives, degraded nodes and disk models with failures.
+
+        Each description is keyed by what makes the finding different from an
+        earlier one, leaving out figures such as percentages that move every poll.
+        """
+        findings = {}
+        window_days = TREND_WINDOW // (24 * 60 * 60)
+        for drive_key, stats in sorted(self.drives.items()):
+            recent, older = stats['recent_failures'], stats['older_failures']
+            if recent > older:
+                findings[f'drive {drive_key} {recent}/{older}'] = (
+                    f"Drive {drive_key} ({stats['disk_model']}): failures rising, "
+                    f'{recent} in the last {window_days} day(s) after {older} in the '
+                    f'{window_days} before, '
+                    f"{stats['failures']} failure(s) in total"
+                )
+        for node_key, stats in sorted(self.nodes.items()):
+            if stats['degraded_slots'] >= DEGRADED_NODE_SLOTS:
+                findings[f"node {node_key} {stats['degraded_slots']}"] = (
+                    f"Node {node_key}: {stats['degraded_slots']} degraded slots"
+                )
+        for model, stats in sorted(self.models.items()):
+            if stats['failures']:
+                drive_seconds = stats['drive_seconds'] or 1
+                unhealthy = stats['unhealthy_drive_seconds'] / drive_seconds
+                findings[f"model {model} {stats['failures']}"] = (
+                    f'Disk model {model}: {unhealthy:.1%} of drive time unhealthy, '
+                    f"{stats['failures']} failure(s)"
+                )
+
+        return findings
+
+
+def roll_failure_window(stats: Dict[str, Any], now: float) -> None:
+    """
+    Move a drive's failure counts on to the window that contains now.
+    """
+    windows = int((now - stats['window_start']) // TREND_WINDOW)
+    if windows > 0:
+        stats['older_failures'] = stats['recent_failures'] if windows == 1 else 0
+        stats['recent_failures'] = 0
+        stats['window_start'] += windows * TREND_WINDOW
+
+
+class StatusBoard:
+    """
+    In-memory view of the latest poll of every cluster, served by the status API.
+
+    The JSON and HTML documents and their ETags are rendered once per poll, so
+    serving a request never touches a cluster.
+    """
+    clusters: Dict[str, Dict[str, Any]]
+
+    def __init__(self) -> None:
+        self.clusters = {}
+        self._lock = threading.Lock()
+        self._documents: Dict[str, Tuple[bytes, str]] = {}
+        self._render()
+
+    def update(
+        self,
+        cluster_name: str,
+        cluster_status: Dict[str, Any],
+        alert_data: Dict[str, Any],
+        poll_seconds: float,
+        notices: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        """
+        Record the latest poll of a cluster, with the devices that matched only
+        'info' health rules as notices.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        with self._lock:
+            self.clusters[cluster_name] = {
+                'healthy': not alert_data,
+                'last_poll': now,
+                'last_attempt': now,
+                'error': None,
+                'poll_seconds': round(poll_seconds, 3),
+                'alerts': list(alert_data.values()),
+                'notices': notices if notices is not None else [],
+                'nodes': cluster_status['nodes'],
+                'drives': cluster_status['drives'],
+            }
+            self._render()
+
+    def record_failure(self, cluster_name: str, error: str) -> None:
+        """
+        Record a failed poll of a cluster. The cluster is shown as unhealthy with the
+        error, alongside the devices from its last successful poll, if any.
+        """
+        with self._lock:
+            cluster = self.clusters.setdefault(
+                cluster_name,
+                {
+                    'last_poll': None,
+                    'poll_seconds': None,
+                    'alerts': [],
+                    'notices': [],
+                    'nodes': [],
+                    'drives': [],
+                },
+            )
+            cluster['healthy'] = False
+            cluster['last_attempt'] = datetime.datetime.now(
+                datetime.timezone.utc
+            ).isoformat()
+            cluster['error'] = error
+            self._render()
+
+    def remove(self, cluster_name: str) -> None:
+        """
+        Forget a cluster that is no longer polled.
+        """
+        with self._lock:
+            if self.clusters.pop(cluster_name, None) is not None:
+                self._render()
+
+    def document(self, content_type: str) -> Tuple[bytes, str]:
+        """
+        Return the rendered ('json' or 'html') document and its ETag.
+        """
+        with self._lock:
+            return self._documents[content_type]
+
+    def _render(self) -> None:
+        json_body = json.dumps({'clusters': self.clusters}, indent=4).encode()
+        html_body = self._render_html().encode()
+        self._documents = {
+            'json': (json_body, f'"{hashlib.sha1(json_body).hexdigest()}"'),
+            'html': (html_body, f'"{hashlib.sha1(html_body).hexdigest()}"'),
+        }
+
+    def _render_html(self) -> str:
+        page = ['<html><head><title>Qumulo Cluster Device Monitor</title></head><body>']
+        for cluster_name, cluster in sorted(self.clusters.items()):
+            health = 'HEALTHY' if cluster['healthy'] else 'UNHEALTHY'
+            if cluster['error'] is not None:
+                health = 'POLL FAILED'
+            page.append(f'<h2>{html.escape(cluster_name)}: {health}</h2>')
+            if cluster['error'] is not None:
+                page.append(
+                    f"<p>Last attempt: {cluster['last_attempt']}, error: "
+                    f"{html.escape(cluster['error'])}</p>"
+                )
+            page.append(
+                f"<p>Last poll: {cluster['last_poll']} "
+                f"({cluster['poll_seconds']} seconds), "
+                f"{len(cluster['alerts'])} active alert(s), "
+                f"{len(cluster['notices'])} notice(s)</p>"
+            )
+            for notice in cluster['notices']:
+                page.append(
+                    f"<p>Notice ({html.escape(str(notice['rule']))}): device "
+                    f"{html.escape(str(notice.get('id')))}</p>"
+                )
+            page.append(
+                '<table border="1"><tr><th>Node</th><th>Status</th><th>Model</th></tr>'
+            )
+            for node in cluster['nodes']:
+                page.append(
+                    '<tr>'
+                    + ''.join(
+                        f'<td>{html.escape(str(node.get(key)))}</td>'
+                        for key in ('id', 'node_status', 'model_number')
+                    )
+                    + '</tr>'
+                )
+            page.append(
+                '</table><br><table border="1"><tr><th>Drive</th><th>Status</th>'
+                '<th>Type</th><th>Model</th></tr>'
+            )
+            for drive in cluster['drives']:
+                page.append(
+                    '<tr>'
+                    + ''.join(
+                        f'<td>{html.escape(str(drive.get(key)))}</td>'
+                        for key in ('id', 'state', 'disk_type', 'disk_model')
+                    )
+                    + '</tr>'
+                )
+            page.append('</table>')
+        page.append('</body></html>')
+
+        return '\n'.join(page)
+
+
+class StatusRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serve the StatusBoard as JSON at /status.json and as HTML at /.
+    """
+    board: StatusBoard
+
+    def do_GET(self) -> None:
+        path = urllib.parse.urlsplit(self.path).path
+        if path in ('/', '/index.html'):
+            content_type, mime_type = 'html', 'text/html; charset=utf-8'
+        elif path == '/status.json':
+            content_type, mime_type = 'json', 'application/json'
+        else:
+            self.send_error(404)
+            return
+
+        body, etag = self.board.document(content_type)
+        if self.etag_matches(etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', mime_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def etag_matches(self, etag: str) -> bool:
+        """
+        Check the If-None-Match header, which may hold '*' or a comma separated
+        list of strong or weak (W/"...") entity tags, against the current ETag.
+        """
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is None:
+            return False
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag in ('*', etag):
+                return True
+        return False
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """
+        Keep request logs out of the poll output.
+        """
+
+
+class StatusHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """
+    HTTP server for the status API, handling each request in its own thread.
+    """
+    daemon_threads = True
+
+
+class AlertJournal:
+    """
+    Write-ahead journal of event alert emails.
+
+    An alert is recorded as pending before it is sent and marked done after, so an
+    alert that was not delivered is replayed by the next run instead of being lost
+    once the new cluster status is recorded. Every entry is flushed to disk before
+    the journal returns.
+    """
+    journal_path: str
+    retries: Dict[str, Tuple[int, float]]
+
+    def __init__(self, journal_path: str = ALERT_JOURNAL_FILE):
+        self.journal_path = journal_path
+        # Entry ID to (failed attempts, monotonic time of the next attempt)
+        self.retries = {}
+
+    def retry_due(self, entry_id: str) -> bool:
+        """
+        Check whether a pending alert may be resent yet.
+        """
+        return self.retries.get(entry_id, (0, 0.0))[1] <= time.monotonic()
+
+    def retry_later(self, entry_id: str) -> None:
+        """
+        Back off exponentially, up to JOURNAL_RETRY_MAX, after a failed resend.
+        """
+        attempts = self.retries.get(entry_id, (0, 0.0))[0] + 1
+        delay = min(JOURNAL_RETRY_MIN * 2 ** (attempts - 1), JOURNAL_RETRY_MAX)
+        self.retries[entry_id] = (attempts, time.monotonic() + delay)
+
+    def record_pending(self, cluster_name: str, subject: str, body: str) -> str:
+        """
+        Record an alert before delivery and return its entry ID.
+        """
+        entry_id = uuid.uuid4().hex
+        self._append(
+            {
+                'op': 'pending',
+                'id': entry_id,
+                'cluster_name': cluster_name,
+                'subject': subject,
+                'body': body,
+            }
+        )
+        return entry_id
+
+    def mark_done(self, entry_id: str) -> None:
+        """
+        Record that an alert was delivered, or dropped.
+        """
+        self._append({'op': 'done', 'id': entry_id})
+        self.retries.pop(entry_id, None)
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """
+        Return alerts recorded as pending and never marked done, oldest first.
+        """
+        pending: Dict[str, Dict[str, Any]] = {}
+        if not os.path.exists(self.journal_path):
+            return []
+
+        with open(self.journal_path, 'r') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn write from an interrupted run; the entry never completed
+                    continue
+                if entry.get('op') == 'pending':
+                    pending[entry['id']] = entry
+                elif entry.get('op') == 'done':
+                    pending.pop(entry.get('id'), None)
+
+        return list(pending.values())
+
+    def compact(self) -> None:
+        """
+        Atomically rewrite the journal keeping only the pending alerts.
+        """
+        if not os.path.exists(self.journal_path):
+            return
+        pending = self.pending()
+        temp_file = self.journal_path + '.tmp'
+        with open(temp_file, 'w') as file:
+            for entry in pending:
+                file.write(json.dumps(entry) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file, self.journal_path)
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        with open(self.journal_path, 'a') as file:
+            file.write(json.dumps(entry) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+
+
+class ClusterMonitor:
+    """
+    Polling state kept for one cluster while running in --daemon mode.
+    """
+    config_data: ConfigData
+    scheduler: PollScheduler
+    rest_client: Optional[RestClient]
+    next_poll: float
+
+    def __init__(self, config_data: ConfigData):
+        self.config_data = config_data
+        self.scheduler = PollScheduler(
+            config_data.poll_interval_min, config_data.poll_interval_max
+        )
+        self.rest_client = None
+        self.next_poll = 0.0
+
+    def poll_failed(self, error: str, status_board: Optional[StatusBoard]) -> None:
+        """
+        Drop the session after a failed poll and show the failure on the status board.
+        """
+        self.rest_client = None
+        if status_board is not None:
+            status_board.record_failure(self.config_data.cluster_name, error)
+
+    def same_connection(self, config_data: ConfigData) -> bool:
+        """
+        Check whether new settings for the cluster reach it the same way, so the
+        session can be kept.
+        """
+        return all(
+            getattr(self.config_data, setting) == getattr(config_data, setting)
+            for setting in CONNECTION_SETTINGS
+        )
+
+    def update_config(self, config_data: ConfigData) -> None:
+        """
+        Pick up settings that do not affect the session, keeping the next poll time.
+        """
+        if (config_data.poll_interval_min, config_data.poll_interval_max) != (
+            self.config_data.poll_interval_min,
+            self.config_data.poll_interval_max,
+        ):
+            self.scheduler = PollScheduler(
+                config_data.poll_interval_min, config_data.poll_interval_max
+            )
+        self.config_data = config_data
+
+    def poll(
+        self,
+        snapshot_format: str,
+        trends: Optional[DeviceTrends] = None,
+        status_board: Optional[StatusBoard] = None,
+        journal: Optional[AlertJournal] = None,
+    ) -> int:
+        """
+        Poll the cluster, reusing its session, and schedule the next poll.
+
+        A failed poll is reported without stopping the daemon; the session is
+        dropped and the next poll is scheduled at the minimum interval.
+        """
+        try:
+            if self.rest_client is None:
+                check_cluster_connectivity(self.config_data)
+                self.rest_client = cluster_login(self.config_data)
+            healthy, changed = poll_cluster(
+                self.config_data,
+                snapshot_format,
+                self.rest_client,
+                trends,
+                status_board,
+                journal,
+            )
+        except ClusterProblem as problem:
+            # The problem was already reported by email, or sending it failed
+            print(f'ERROR: Polling {self.config_data.cluster_name} failed.\n{problem}')
+            self.poll_failed(str(problem), status_board)
+            healthy, changed = False, True
+        except Exception as err:
+            print(f'ERROR: {err}\nPolling {self.config_data.cluster_name} failed.')
+            report_script_problem(str(err), self.config_data)
+            self.poll_failed(str(err), status_board)
+            healthy, changed = False, True
+        interval = self.scheduler.next_interval(healthy, changed)
+        self.next_poll = time.monotonic() + interval
+
+        return interval
+
+
+class ConfigWatcher:
+    """
+    Validated config that is cached and reloaded when the file changes on disk.
+    """
+    config_path: str
+    clusters: Dict[str, ConfigData]
+
+    def __init__(self, config_path: str):
+        self.config_path = config_path
+        self.clusters = {}
+        self._mtime: Optional[int] = None
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload the config if its mtime changed. Returns True if a new config was loaded.
+
+        An unreadable or invalid config is reported and the cached config is kept.
+        """
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+        except OSError as err:
+            print(f'ERROR: {err}\nUnable to check config. Keeping current config.')
+            return False
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+
+        try:
+            with open(self.config_path, 'r') as file:
+                config_file = json.load(file)
+        except (OSError, ValueError) as err:
+            print(f'ERROR: {err}\nUnable to load config. Keeping current config.')
+            return False
+        errors = validate_config(config_file)
+        if errors:
+            print('ERROR: ' + '\n'.join(errors) + '\nKeeping current config.')
+            return False
+
+        self.clusters = {
+            config_data.cluster_name: config_data
+            for config_data in parse_cluster_configs(config_file)
+        }
+        return True
 
 
 class EmailMessage:
@@ -107,7 +928,7 @@ class EmailMessage:
         mmsg['Subject'] = self.subject
         mmsg['From'] = self.config.sender
         mmsg['To'] = ', '.join(self.config.mail_to)
-        session = smtplib.SMTP(self.config.server)
+        session = smtplib.SMTP(self.config.server, timeout=SMTP_TIMEOUT)
 
         session.sendmail(self.config.sender, self.config.mail_to, mmsg.as_string())
         session.quit()
@@ -120,7 +941,217 @@ class EmailMessage:
 # |_| |_|_____|_____|_|   |_____|_| \_\____/
 
 
-def parse_config(config_file: Dict[str, Any]) -> ConfigData:
+def compile_rule_conditions(
+    conditions: Dict[str, Any]
+) -> List[Tuple[str, FrozenSet[str], bool]]:
+    """
+    Compile the 'match' or 'exclude' conditions of a health rule.
+    """
+    if not isinstance(conditions, dict):
+        raise ValueError('Rule conditions must be an object of field: condition.')
+
+    compiled = []
+    for field, condition in conditions.items():
+        negate = False
+        if isinstance(condition, dict):
+            if set(condition) == {'in'}:
+                condition = condition['in']
+            elif set(condition) == {'not_in'}:
+                condition = condition['not_in']
+                negate = True
+            else:
+                raise ValueError(f'Condition for {field} must use "in" or "not_in".')
+        if not isinstance(condition, list):
+            condition = [condition]
+        compiled.append((field, frozenset(str(value) for value in condition), negate))
+
+    return compiled
+
+
+def compile_health_rules(rules: List[Dict[str, Any]]) -> Dict[str, List[HealthRule]]:
+    """
+    Compile health rules from the config, grouped by the device type they apply to.
+    """
+    if not isinstance(rules, list):
+        raise ValueError('health_rules must be a list of rules.')
+
+    compiled: Dict[str, List[HealthRule]] = {'nodes': [], 'drives': []}
+    for number, rule in enumerate(rules, 1):
+        if not isinstance(rule, dict):
+            raise ValueError(f'Health rule {number} must be an object.')
+        name = str(rule.get('name', f'rule {number}'))
+        device_type = rule.get('devices')
+        severity = rule.get('severity', 'critical')
+        unknown_fields = sorted(set(rule) - HEALTH_RULE_FIELDS)
+        if unknown_fields:
+            raise ValueError(
+                f"Health rule {name}: unknown field(s) {', '.join(unknown_fields)}."
+            )
+        if device_type not in compiled:
+            raise ValueError(f'Health rule {name}: devices must be "nodes" or "drives".')
+        if severity not in SEVERITY_LEVELS:
+            raise ValueError(
+                f'Health rule {name}: severity must be one of '
+                f"{', '.join(SEVERITY_LEVELS)}."
+            )
+        if not isinstance(rule.get('match'), dict) or not rule['match']:
+            raise ValueError(
+                f'Health rule {name}: match must have at least one condition.'
+            )
+        compiled[device_type].append(
+            HealthRule(
+                name,
+                device_type,
+                severity,
+                compile_rule_conditions(rule['match']),
+                compile_rule_conditions(rule.get('exclude', {})),
+            )
+        )
+
+    return compiled
+
+
+DEFAULT_COMPILED_HEALTH_RULES = compile_health_rules(DEFAULT_HEALTH_RULES)
+
+
+def validate_config(config_file: Any) -> List[str]:
+    """
+    Check the config file against CONFIG_SCHEMA and return a list of problems found.
+    """
+    if not isinstance(config_file, dict):
+        return ['Config must be a JSON object.']
+
+    errors = []
+    for stanza, elements in CONFIG_SCHEMA.items():
+        settings = config_file.get(stanza)
+        if stanza == 'cluster_settings' and isinstance(settings, list):
+            entries = settings
+            errors.extend(validate_cluster_list(entries))
+        else:
+            entries = [settings]
+
+        for entry in entries:
+            errors.extend(validate_stanza(stanza, elements, entry))
+
+    try:
+        compile_health_rules(config_file.get('health_rules', DEFAULT_HEALTH_RULES))
+    except ValueError as err:
+        errors.append(f'health_rules: {err}')
+
+    return errors
+
+
+def validate_cluster_list(entries: List[Any]) -> List[str]:
+    """
+    Check a list of cluster_settings as a whole.
+    """
+    errors = []
+    names = [
+        str(entry.get('cluster_name')) for entry in entries if isinstance(entry, dict)
+    ]
+    if not entries:
+        errors.append('cluster_settings: At least one cluster is required.')
+    if len(names) != len(set(names)):
+        errors.append('cluster_settings: cluster_name values must be unique.')
+
+    return errors
+
+
+def validate_stanza(stanza: str, elements: Dict[str, type], entry: Any) -> List[str]:
+    """
+    Check one config stanza, or one cluster's settings, against its schema.
+    """
+    if not isinstance(entry, dict):
+        return [f'{stanza}: Expected an object.']
+
+    errors = []
+    optional = OPTIONAL_CLUSTER_SETTINGS if stanza == 'cluster_settings' else {}
+    if stanza == 'cluster_settings' and not (
+        'password' in entry or 'access_token' in entry
+    ):
+        errors.append(
+            f'{stanza}: Configuration element missing: password or access_token'
+        )
+    for key, expected_type in list(elements.items()) + list(optional.items()):
+        if key not in entry:
+            if key not in optional:
+                errors.append(f'{stanza}: Configuration element missing: {key}')
+            continue
+        if not config_value_is_valid(entry[key], expected_type):
+            errors.append(f'{stanza}: {key} must be of type {expected_type.__name__}.')
+    if stanza == 'cluster_settings':
+        errors.extend(validate_cluster_settings(entry))
+
+    return errors
+
+
+def validate_cluster_settings(settings: Dict[str, Any]) -> List[str]:
+    """
+    Check the values of one cluster's settings beyond their types.
+    """
+    errors = []
+    cluster_name = settings.get('cluster_name')
+    if isinstance(cluster_name, str) and (
+        not cluster_name or any(sep in cluster_name for sep in PATH_SEPARATORS)
+    ):
+        errors.append(
+            'cluster_settings: cluster_name must not be empty or contain path separators.'
+        )
+
+    intervals = {}
+    for key, default in (
+        ('poll_interval_min', DEFAULT_POLL_INTERVAL_MIN),
+        ('poll_interval_max', DEFAULT_POLL_INTERVAL_MAX),
+    ):
+        value = settings.get(key, default)
+        if not config_value_is_valid(value, int):
+            return errors
+        intervals[key] = int(value)
+        if intervals[key] <= 0:
+            errors.append(f'cluster_settings: {key} must be a positive integer.')
+    if intervals['poll_interval_min'] > intervals['poll_interval_max']:
+        errors.append(
+            'cluster_settings: poll_interval_min must not exceed poll_interval_max.'
+        )
+
+    return errors
+
+
+def config_value_is_valid(value: Any, expected_type: type) -> bool:
+    """
+    Check a single config value. Integers may also be given as numeric strings.
+    """
+    if expected_type is int:
+        try:
+            int(value)
+        except (TypeError, ValueError):
+            return False
+        return True
+
+    return isinstance(value, expected_type)
+
+
+def parse_cluster_configs(config_file: Dict[str, Any]) -> List[ConfigData]:
+    """
+    Extract one ConfigData per cluster in the config file.
+
+    When cluster_settings is a list, each cluster records its status under its own
+    file name prefix so the clusters do not overwrite each other's snapshots.
+    """
+    cluster_settings = config_file.get('cluster_settings')
+    if not isinstance(cluster_settings, list):
+        return [parse_config(config_file)]
+
+    return [
+        parse_config(
+            dict(config_file, cluster_settings=settings),
+            f"{settings.get('cluster_name')}_",
+        )
+        for settings in cluster_settings
+    ]
+
+
+def parse_config(config_file: Dict[str, Any], status_prefix: str = '') -> ConfigData:
     """
     Extract values from the config file.
     """
@@ -128,12 +1159,30 @@ def parse_config(config_file: Dict[str, Any]) -> ConfigData:
         cluster_address = config_file['cluster_settings']['cluster_address']
         cluster_name = config_file['cluster_settings']['cluster_name']
         username = config_file['cluster_settings']['username']
-        password = config_file['cluster_settings']['password']
+        access_token = config_file['cluster_settings'].get('access_token')
+        if access_token is None:
+            password = config_file['cluster_settings']['password']
+        else:
+            password = config_file['cluster_settings'].get('password')
         rest_port = int(config_file['cluster_settings']['rest_port'])
+        poll_interval_min = int(
+            config_file['cluster_settings'].get(
+                'poll_interval_min', DEFAULT_POLL_INTERVAL_MIN
+            )
+        )
+        poll_interval_max = int(
+            config_file['cluster_settings'].get(
+                'poll_interval_max', DEFAULT_POLL_INTERVAL_MAX
+            )
+        )
 
         sender = config_file['email_settings']['sender']
         server = config_file['email_settings']['server']
         mail_to = config_file['email_settings']['mail_to']
+
+        health_rules = compile_health_rules(
+            config_file.get('health_rules', DEFAULT_HEALTH_RULES)
+        )
     except Exception as err:
         sys.exit(f'ERROR: {err}\nConfiguration element missing. Exiting...')
 
@@ -146,6 +1195,11 @@ def parse_config(config_file: Dict[str, Any]) -> ConfigData:
         sender,
         server,
         mail_to,
+        poll_interval_min,
+        poll_interval_max,
+        status_prefix,
+        access_token,
+        health_rules,
     )
 
 
@@ -160,13 +1214,16 @@ def load_json(config_path: str) -> Dict[str, Any]:
         sys.exit(f'ERROR: {err}\nInvalid JSON file: {config_path}. Exiting...')
 
 
-def load_and_parse_config(config_path: str) -> ConfigData:
+def load_and_parse_config(config_path: str) -> List[ConfigData]:
     """
-    Load config JSON file and record information.
+    Load and validate config JSON file and record information for every cluster.
     """
     try:
         config_file = load_json(config_path)
-        return parse_config(config_file)
+        errors = validate_config(config_file)
+        if errors:
+            sys.exit('ERROR: ' + '\n'.join(errors) + '\nInvalid config. Exiting...')
+        return parse_cluster_configs(config_file)
     except Exception as err:
         sys.exit(f'ERROR: {err}\nUnable to load or parse config. Exiting...')
 
@@ -184,12 +1241,23 @@ def check_cluster_connectivity(config_data: ConfigData) -> None:
         generate_script_problem_email(str(err), config_data)
 
 
-def delete_previous_cluster_status() -> None:
+def snapshot_files(snapshot_format: str, status_prefix: str = '') -> Tuple[str, str]:
     """
-    Delete cluster_status_previous.json if it exists.
+    Return the current and previous snapshot file names for a cluster.
     """
-    if 'cluster_status_previous.json' in os.listdir():
-        os.remove('cluster_status_previous.json')
+    current_file, previous_file = SNAPSHOT_FILES[snapshot_format]
+    return status_prefix + current_file, status_prefix + previous_file
+
+
+def delete_previous_cluster_status(
+    snapshot_format: str = 'json', status_prefix: str = ''
+) -> None:
+    """
+    Delete the previous cluster status snapshot if it exists.
+    """
+    previous_file = snapshot_files(snapshot_format, status_prefix)[1]
+    if previous_file in os.listdir():
+        os.remove(previous_file)
 
 
 #   ___  _   _ _____ ______   __     _    ____ ___
@@ -200,14 +1268,99 @@ def delete_previous_cluster_status() -> None:
 #
 
 
+def token_cache_key(config_data: ConfigData) -> str:
+    """
+    Key identifying a cluster login in the session token cache.
+    """
+    return (
+        f'{config_data.username}@{config_data.cluster_address}:{config_data.rest_port}'
+    )
+
+
+def load_session_tokens() -> Dict[str, str]:
+    """
+    Load the session token cache, ignoring it if missing, unreadable, too permissive
+    or owned by another user.
+    """
+    try:
+        cache_stat = os.stat(TOKEN_CACHE_FILE)
+        if cache_stat.st_uid != os.getuid():
+            print(f'WARNING: {TOKEN_CACHE_FILE} is owned by another user. Ignoring it.')
+            return {}
+        if cache_stat.st_mode & 0o077:
+            print(f'WARNING: {TOKEN_CACHE_FILE} is readable by other users. Ignoring it.')
+            return {}
+        with open(TOKEN_CACHE_FILE, 'r') as file:
+            tokens = json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+    return tokens if isinstance(tokens, dict) else {}
+
+
+def save_session_tokens(tokens: Dict[str, str]) -> None:
+    """
+    Atomically write the session token cache, readable by the owner only. The
+    temporary file gets a fresh name so an existing file or link is never reused.
+    """
+    fd, temp_file = tempfile.mkstemp(
+        prefix=os.path.basename(TOKEN_CACHE_FILE) + '.',
+        dir=os.path.dirname(os.path.abspath(TOKEN_CACHE_FILE)),
+    )
+    try:
+        with os.fdopen(fd, 'w') as file:
+            json.dump(tokens, file)
+        os.replace(temp_file, TOKEN_CACHE_FILE)
+    except BaseException:
+        os.remove(temp_file)
+        raise
+
+
+def cache_session_token(config_data: ConfigData, bearer_token: Optional[str]) -> None:
+    """
+    Record (or with None, forget) the session token for a cluster login.
+    """
+    tokens = load_session_tokens()
+    if bearer_token is None:
+        if tokens.pop(token_cache_key(config_data), None) is None:
+            return
+    else:
+        tokens[token_cache_key(config_data)] = bearer_token
+
+    try:
+        save_session_tokens(tokens)
+    except OSError as err:
+        print(f'WARNING: {err}\nUnable to update {TOKEN_CACHE_FILE}.')
+
+
+def refresh_session(rest_client: RestClient, config_data: ConfigData) -> None:
+    """
+    Log in with username and password, and cache the new session token.
+    """
+    credentials = rest_client.login(config_data.username, config_data.password)
+    cache_session_token(config_data, credentials.bearer_token)
+
+
 def cluster_login(config_data: ConfigData) -> Optional[RestClient]:
     """
     Log into cluster via Qumulo Rest API.
+
+    An access token from the config or a cached session token is used as is; the
+    cluster is only asked for a new session when neither is available.
     """
     rest_client = None
     try:
+        bearer_token = config_data.access_token
+        if bearer_token is None:
+            bearer_token = load_session_tokens().get(token_cache_key(config_data))
+        if bearer_token is not None:
+            return RestClient(
+                config_data.cluster_address,
+                config_data.rest_port,
+                credentials=Credentials(bearer_token),
+            )
         rest_client = RestClient(config_data.cluster_address, config_data.rest_port)
-        rest_client.login(config_data.username, config_data.password)
+        refresh_session(rest_client, config_data)
     except (TimeoutError, RequestError) as err:
         generate_script_problem_email(str(err), config_data)
 
@@ -221,22 +1374,61 @@ def qq_api_query(
     Query Qumulo via Qumulo REST API for cluster information based on api_call.
     """
     response = None
+    requests: Dict[str, Callable[[], Any]] = {
+        'cluster_name': lambda: rest_client.cluster.get_cluster_conf()['cluster_name'],
+        'qq_version': lambda: rest_client.version.version()['revision_id'],
+        'cluster_time': lambda: rest_client.time_config.get_time_status()['time'],
+        'cluster_uuid': lambda: rest_client.node_state.get_node_state()['cluster_id'],
+    }
 
     try:
-        if api_call == 'cluster_name':
-            response = rest_client.cluster.get_cluster_conf()['cluster_name']
-        elif api_call == 'qq_version':
-            response = rest_client.version.version()['revision_id']
-        elif api_call == 'cluster_time':
-            response = rest_client.time_config.get_time_status()['time']
-        elif api_call == 'cluster_uuid':
-            response = rest_client.node_state.get_node_state()['cluster_id']
+        if api_call in requests:
+            response = rest_request(rest_client, config_data, requests[api_call])
     except TimeoutError as err:
         generate_script_problem_email(str(err), config_data)
 
     return response
 
 
+def rest_request(
+    rest_client: RestClient, config_data: ConfigData, request: Callable[[], Any]
+) -> Any:
+    """
+    Make a REST request, logging in again and retrying once if the session was
+    rejected. Other request errors are reported as script problems, which raises
+    ClusterProblem.
+    """
+    try:
+        return request()
+    except RequestError as err:
+        if int(err.status_code) != 401 or config_data.access_token is not None:
+            generate_script_problem_email(str(err), config_data)
+
+    cache_session_token(config_data, None)
+    try:
+        refresh_session(rest_client, config_data)
+        return request()
+    except RequestError as err:
+        generate_script_problem_email(str(err), config_data)
+
+
+def retrieve_cluster_status(
+    rest_client: RestClient, config_data: ConfigData
+) -> Dict[str, Any]:
+    """
+    API Query: Retrieve statuses of nodes and drives.
+    """
+    status_of_nodes = retrieve_status_of_cluster_devices(
+        rest_client, config_data, 'nodes'
+    )
+    status_of_drives = retrieve_status_of_cluster_devices(
+        rest_client, config_data, 'drives'
+    )
+    status_of_nodes['drives'] = status_of_drives['drives']
+
+    return status_of_nodes
+
+
 def retrieve_status_of_cluster_devices(
     rest_client: RestClient, config_data: ConfigData, device_type: str
 ) -> Dict[str, Any]:
@@ -247,9 +1439,13 @@ def retrieve_status_of_cluster_devices(
 
     try:
         if device_type == 'nodes':
-            status_of_devices['nodes'] = rest_client.cluster.list_nodes()
+            status_of_devices['nodes'] = rest_request(
+                rest_client, config_data, rest_client.cluster.list_nodes
+            )
         elif device_type == 'drives':
-            status_of_devices['drives'] = rest_client.cluster.get_cluster_slots_status()
+            status_of_devices['drives'] = rest_request(
+                rest_client, config_data, rest_client.cluster.get_cluster_slots_status
+            )
     except TimeoutError as err:
         generate_script_problem_email(str(err), config_data)
 
@@ -264,43 +1460,332 @@ def retrieve_status_of_cluster_devices(
 #                                      |_____|_____|
 
 
-def preserve_cluster_status(cluster_status: Dict[str, Any]) -> None:
+def encode_compact_records(
+    cluster_status: Dict[str, Any]
+) -> Iterator[Tuple[bytes, bytes]]:
     """
-    Preserve the previous cluster status if it exists, and create new cluster status JSON file.
+    Serialize cluster status into (kind, payload) compact snapshot records.
     """
-    cluster_status_json = 'cluster_status.json'
-    cluster_status_previous_json = 'cluster_status_previous.json'
+    for kind, device_type in SNAPSHOT_KINDS.items():
+        for device in cluster_status[device_type]:
+            yield kind, json.dumps(device, separators=(',', ':')).encode()
+
 
-    if cluster_status_json in os.listdir():
-        os.rename(cluster_status_json, cluster_status_previous_json)
-    with open(cluster_status_json, 'w') as file:
-        json.dump(cluster_status, file, indent=4)
+def write_compact_snapshot(cluster_status: Dict[str, Any], snapshot_path: str) -> None:
+    """
+    Write cluster status as a compact snapshot with one checksummed record per device.
+    """
+    with open(snapshot_path, 'wb') as file:
+        file.write(SNAPSHOT_MAGIC)
+        for kind, payload in encode_compact_records(cluster_status):
+            file.write(
+                SNAPSHOT_RECORD_HEADER.pack(kind, len(payload), zlib.crc32(payload))
+            )
+            file.write(payload)
 
 
-def check_for_unhealthy_objects(cluster_status: Dict[str, Any]) -> Tuple[dict, bool]:
+def iter_compact_snapshot(snapshot_path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
     """
-    Parse through cluster_state.json for unhealthy objects.
+    Memory-map a compact snapshot and yield (device_type, device) one record at a time.
     """
-    nodes = cluster_status['nodes']
-    drives = cluster_status['drives']
-    alert_data = {}
-    healthy = True
-    counter = 1
+    for kind, payload in iter_compact_records(snapshot_path):
+        yield SNAPSHOT_KINDS[kind], json.loads(payload.decode())
 
-    # scan through JSON for offline nodes
-    for node in nodes:
-        if node['node_status'] != 'online':
-            alert_data[f'Event {counter}'] = node
-            counter += 1
-            healthy = False
-    # scan through JSON for unhealthy drives
-    for drive in drives:
-        if drive['state'] != 'healthy':
-            alert_data[f'Event {counter}'] = drive
-            counter += 1
-            healthy = False
 
-    return alert_data, healthy
+def iter_compact_records(snapshot_path: str) -> Iterator[Tuple[bytes, bytes]]:
+    """
+    Memory-map a compact snapshot and yield its checksummed (kind, payload) records
+    without decoding them.
+    """
+    with open(snapshot_path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as snapshot:
+            if snapshot[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                raise ValueError('Bad snapshot header')
+            offset = len(SNAPSHOT_MAGIC)
+            while offset < len(snapshot):
+                end_of_header = offset + SNAPSHOT_RECORD_HEADER.size
+                if end_of_header > len(snapshot):
+                    raise ValueError(f'Truncated record header at offset {offset}')
+                kind, length, checksum = SNAPSHOT_RECORD_HEADER.unpack(
+                    snapshot[offset:end_of_header]
+                )
+                payload = snapshot[end_of_header:end_of_header + length]
+                if len(payload) != length or zlib.crc32(payload) != checksum:
+                    raise ValueError(f'Checksum mismatch for record at offset {offset}')
+                if kind not in SNAPSHOT_KINDS:
+                    raise ValueError(f'Unknown record kind {kind!r} at offset {offset}')
+                yield kind, payload
+                offset = end_of_header + length
+
+
+def compact_snapshot_matches(cluster_status: Dict[str, Any], snapshot_path: str) -> bool:
+    """
+    Compare cluster status with a compact snapshot record by record, stopping at
+    the first device that differs. The snapshot's records are never decoded.
+    """
+    records = encode_compact_records(cluster_status)
+    for record in iter_compact_records(snapshot_path):
+        if next(records, None) != record:
+            return False
+
+    return next(records, None) is None
+
+
+def snapshot_changed(
+    cluster_status: Dict[str, Any], snapshot_path: str, snapshot_format: str = 'json'
+) -> bool:
+    """
+    Check whether cluster status differs from a recorded snapshot. Raises ValueError
+    if the snapshot is corrupt and OSError if it cannot be read.
+    """
+    if snapshot_format == 'compact':
+        return not compact_snapshot_matches(cluster_status, snapshot_path)
+    return read_snapshot(snapshot_path, snapshot_format) != cluster_status
+
+
+def read_snapshot(snapshot_path: str, snapshot_format: str = 'json') -> Dict[str, Any]:
+    """
+    Read a cluster status snapshot written in the given format. Raises ValueError
+    if the snapshot is corrupt and OSError if it cannot be read.
+    """
+    if snapshot_format != 'compact':
+        with open(snapshot_path, 'r') as file:
+            return json.load(file)
+
+    cluster_status: Dict[str, Any] = {
+        device_type: [] for device_type in SNAPSHOT_KINDS.values()
+    }
+    for device_type, device in iter_compact_snapshot(snapshot_path):
+        cluster_status[device_type].append(device)
+
+    return cluster_status
+
+
+def preserve_cluster_status(
+    cluster_status: Dict[str, Any], snapshot_format: str = 'json', status_prefix: str = ''
+) -> None:
+    """
+    Preserve the previous cluster status if it exists, and create new cluster status snapshot.
+    The new snapshot is written to a temporary file first so a crash never leaves a
+    truncated one behind.
+    """
+    cluster_status_file, cluster_status_previous_file = snapshot_files(
+        snapshot_format, status_prefix
+    )
+
+    temp_file = cluster_status_file + '.tmp'
+    if snapshot_format == 'compact':
+        write_compact_snapshot(cluster_status, temp_file)
+    else:
+        with open(temp_file, 'w') as file:
+            json.dump(cluster_status, file, indent=4)
+    if cluster_status_file in os.listdir():
+        os.rename(cluster_status_file, cluster_status_previous_file)
+    os.replace(temp_file, cluster_status_file)
+
+
+def evaluate_health_rules(
+    cluster_status: Dict[str, Any], health_rules: Dict[str, List[HealthRule]]
+) -> List[Tuple[HealthRule, Dict[str, Any]]]:
+    """
+    Match every device against the rules for its type in a single pass over the
+    device records. Returns (rule, device) for each matching device, using the
+    first of the most severe rules it matched.
+    """
+    matches = []
+    for device_type in ('nodes', 'drives'):
+        rules = health_rules.get(device_type, [])
+        for device in cluster_status[device_type]:
+            matched_rule: Optional[HealthRule] = None
+            for rule in rules:
+                if rule.matches(device) and (
+                    matched_rule is None
+                    or SEVERITY_LEVELS[rule.severity]
+                    > SEVERITY_LEVELS[matched_rule.severity]
+                ):
+                    matched_rule = rule
+            if matched_rule is not None:
+                matches.append((matched_rule, device))
+
+    return matches
+
+
+def check_cluster_health(
+    cluster_status: Dict[str, Any],
+    health_rules: Optional[Dict[str, List[HealthRule]]] = None,
+) -> Tuple[dict, List[Dict[str, Any]]]:
+    """
+    Match the devices against the health rules. Returns the alert events, most
+    severe first, and the notices from devices that matched only 'info' rules. Each
+    one is the device record with the severity and name of the rule it matched.
+    """
+    if health_rules is None:
+        health_rules = DEFAULT_COMPILED_HEALTH_RULES
+    events = [
+        dict(device, severity=rule.severity, rule=rule.name)
+        for rule, device in evaluate_health_rules(cluster_status, health_rules)
+    ]
+    unhealthy = sorted(
+        (event for event in events if SEVERITY_LEVELS[event['severity']] > 0),
+        key=lambda event: -SEVERITY_LEVELS[event['severity']],
+    )
+    alert_data = {
+        f'Event {counter}': event for counter, event in enumerate(unhealthy, 1)
+    }
+    notices = [event for event in events if SEVERITY_LEVELS[event['severity']] == 0]
+
+    return alert_data, notices
+
+
+def check_for_unhealthy_objects(
+    cluster_status: Dict[str, Any],
+    health_rules: Optional[Dict[str, List[HealthRule]]] = None,
+) -> Tuple[dict, bool]:
+    """
+    Parse through cluster_state.json for unhealthy objects, most severe first.
+    """
+    alert_data, _notices = check_cluster_health(cluster_status, health_rules)
+
+    return alert_data, not alert_data
+
+
+def evaluate_cluster_status(
+    cluster_status: Dict[str, Any],
+    previous_status: Optional[Dict[str, Any]],
+    health_rules: Optional[Dict[str, List[HealthRule]]] = None,
+) -> Tuple[dict, bool, bool]:
+    """
+    Find unhealthy objects and whether the status changed since the previous one.
+    Returns (alert_data, healthy, changed); an alert is due when unhealthy and changed.
+    """
+    alert_data, healthy = check_for_unhealthy_objects(cluster_status, health_rules)
+    changed = previous_status is None or cluster_status != previous_status
+
+    return alert_data, healthy, changed
+
+
+def replay_snapshots(
+    replay_dir: str, health_rules: Optional[Dict[str, List[HealthRule]]] = None
+) -> Tuple[List[Tuple[str, int, str]], List[Tuple[str, str]], int, float]:
+    """
+    Feed recorded snapshots, in file name order, through the alerting logic without
+    touching a cluster or an SMTP server. Corrupt snapshots are skipped and the
+    next one is compared against the last snapshot that could be read.
+
+    Returns the (snapshot, event count, email body) of every alert that would have
+    been sent, the (snapshot, error) of every skipped snapshot, the number of
+    snapshots replayed and the seconds spent replaying them.
+    """
+    snapshot_names = sorted(
+        name for name in os.listdir(replay_dir) if name.endswith(('.json', '.snap'))
+    )
+    alerts = []
+    skipped = []
+    previous_status = None
+
+    start = time.perf_counter()
+    for name in snapshot_names:
+        snapshot_format = 'compact' if name.endswith('.snap') else 'json'
+        snapshot_path = os.path.join(replay_dir, name)
+        try:
+            cluster_status = read_snapshot(snapshot_path, snapshot_format)
+        except (OSError, ValueError) as err:
+            skipped.append((name, str(err)))
+            continue
+        alert_data, healthy, changed = evaluate_cluster_status(
+            cluster_status, previous_status, health_rules
+        )
+        if not healthy and changed:
+            cluster_info: Dict[str, Optional[str]] = {
+                'cluster_name': f'replay of {name}',
+                'cluster_uuid': None,
+                'cluster_time': None,
+                'qq_version': None,
+            }
+            email_alert = build_alert_email_body(alert_data, cluster_info)
+            alerts.append((name, len(alert_data), email_alert))
+        previous_status = cluster_status
+    elapsed = time.perf_counter() - start
+
+    return alerts, skipped, len(snapshot_names) - len(skipped), elapsed
+
+
+def print_replay_report(
+    alerts: List[Tuple[str, int, str]],
+    skipped: List[Tuple[str, str]],
+    snapshot_count: int,
+    elapsed: float,
+) -> None:
+    """
+    Print the alerts a replay would have sent, the snapshots it skipped and the
+    replay throughput.
+    """
+    for name, events, _email_alert in alerts:
+        print(f'{name}: alert with {events} event(s) would have been sent.')
+    for name, error in skipped:
+        print(f'{name}: skipped invalid snapshot: {error}')
+    rate = snapshot_count / elapsed if elapsed else float('inf')
+    print(
+        f'Replayed {snapshot_count} snapshot(s) in {elapsed:.3f} seconds '
+        f'({rate:.1f} snapshots/second), {len(alerts)} alert(s), '
+        f'{len(skipped)} skipped.'
+    )
+
+
+def start_status_server(
+    board: StatusBoard, port: int, address: str = '127.0.0.1'
+) -> StatusHTTPServer:
+    """
+    Serve the status board over HTTP from a background thread.
+    """
+    handler = type('BoundStatusRequestHandler', (StatusRequestHandler,), {'board': board})
+    server = StatusHTTPServer((address, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f'Serving cluster status on http://{address}:{server.server_address[1]}/')
+
+    return server
+
+
+def load_device_trends(trends_path: str = TRENDS_FILE) -> DeviceTrends:
+    """
+    Load the trend aggregates recorded by previous runs, if any.
+    """
+    if not os.path.exists(trends_path):
+        return DeviceTrends()
+    trends = load_json(trends_path)
+
+    return DeviceTrends(
+        trends['drives'],
+        trends['nodes'],
+        trends['models'],
+        trends.get('clusters'),
+        trends.get('findings'),
+    )
+
+
+def save_device_trends(trends: DeviceTrends, trends_path: str = TRENDS_FILE) -> None:
+    """
+    Atomically record the trend aggregates for the next run.
+    """
+    temp_file = trends_path + '.tmp'
+    with open(temp_file, 'w') as file:
+        json.dump(vars(trends), file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_file, trends_path)
+
+
+def record_device_trends(trends: DeviceTrends) -> None:
+    """
+    Print findings that are new or changed since the last report, and save the
+    trend aggregates.
+    """
+    findings = trends.report()
+    for key, line in findings.items():
+        if key not in trends.findings:
+            print(f'TREND: {line}')
+    trends.findings = list(findings)
+    save_device_trends(trends)
 
 
 #  _____ __  __    _    ___ _     ___ _   _  ____
@@ -315,26 +1800,51 @@ def populate_alert_email_body(
 ) -> str:
     """
     Generate email body for alert information.
-    """
-    qq_version = qq_api_query(rest_client, config_data, 'qq_version')
-    cluster_name = qq_api_query(rest_client, config_data, 'cluster_name')
-    cluster_uuid = qq_api_query(rest_client, config_data, 'cluster_uuid')
-    cluster_time = qq_api_query(rest_client, config_data, 'cluster_time')
 
+    Cluster details that cannot be looked up are left out, so a failing lookup
+    never stops the alert itself from being sent.
+    """
+    cluster_info: Dict[str, Optional[str]] = {
+        api_call: None
+        for api_call in ('qq_version', 'cluster_name', 'cluster_uuid', 'cluster_time')
+    }
+    for api_call in cluster_info:
+        try:
+            cluster_info[api_call] = qq_api_query(rest_client, config_data, api_call)
+        except (ClusterProblem, Exception) as err:
+            print(f'WARNING: {err}\nUnable to look up cluster details for the alert.')
+            break
+    if cluster_info['cluster_name'] is None:
+        cluster_info['cluster_name'] = config_data.cluster_name
+
+    return build_alert_email_body(alert_data, cluster_info)
+
+
+def build_alert_email_body(
+    alert_data: Dict[str, Any], cluster_info: Dict[str, Optional[str]]
+) -> str:
+    """
+    Format the email body for alert information and the cluster it came from.
+    """
     alert_header = '=' * 19 + '<b> CLUSTER EVENT ALERT! </b>' + '=' * 19
     node_event_heading = '=' * 23 + '<b> NODE OFFLINE </b>' + '=' * 23
     drive_event_heading = '=' * 21 + '<b> DRIVE UNHEALTHY </b>' + '=' * 21
     email_alert = (
         f'{alert_header}\nUnhealthy object(s) found. See below for '
         'info and engage Qumulo Support in your preferred fashion.\n'
-        f'Cluster name: {cluster_name}\n'
-        f'Cluster UUID: {cluster_uuid}\n'
-        f'Approx. time: {cluster_time} UTC\n'
-        f'Qumulo Core Version: {qq_version}\n\n'
+        f"Cluster name: {cluster_info['cluster_name']}\n"
+        f"Cluster UUID: {cluster_info['cluster_uuid']}\n"
+        f"Approx. time: {cluster_info['cluster_time']} UTC\n"
+        f"Qumulo Core Version: {cluster_info['qq_version']}\n\n"
         f'<i>{len(alert_data)} Event(s) found:</i>\n'
     )
 
     for entry in alert_data:
+        if 'severity' in alert_data[entry]:
+            email_alert += (
+                f"<b>{entry}: {alert_data[entry]['severity'].upper()}</b> "
+                f"(rule: {alert_data[entry].get('rule')})\n"
+            )
         for key in alert_data[entry].keys():
             if key == 'node_status':  # node alert
                 email_alert += node_event_heading
@@ -363,31 +1873,81 @@ def populate_alert_email_body(
     return email_alert
 
 
-def generate_event_alert_email(config_data: ConfigData, email_alert: str) -> None:
+def event_alert_subject(config_data: ConfigData) -> str:
     """
-    Build and send event alert email.
+    Subject of the event alert email for a cluster.
     """
-    subject = f'Event alert for Qumulo cluster: {config_data.cluster_name}'
+    return f'Event alert for Qumulo cluster: {config_data.cluster_name}'
+
+
+def generate_event_alert_email(
+    config_data: ConfigData,
+    email_alert: str,
+    journal: Optional[AlertJournal] = None,
+    entry_id: Optional[str] = None,
+) -> None:
+    """
+    Build and send event alert email, recording it in the alert journal if given
+    and not already recorded as entry_id.
+    """
+    subject = event_alert_subject(config_data)
     body = email_alert
     eml = EmailMessage(config_data, subject, body)
+    if journal is not None and entry_id is None:
+        entry_id = journal.record_pending(config_data.cluster_name, subject, body)
 
     print('ALERT!! Unhealthy device event(s) found!')
 
     try:
         eml.send()
-        print('EMAIL SENT.')
     except Exception as err:
-        sys.exit(f'ERROR: {err}\nCheck connection to SMTP server. Exiting...')
+        raise ClusterProblem(f'ERROR: {err}\nCheck connection to SMTP server. Exiting...')
 
+    if journal is not None and entry_id is not None:
+        journal.mark_done(entry_id)
+    print('EMAIL SENT.')
 
-def generate_script_problem_email(error: str, config_data: ConfigData) -> None:
+
+def replay_alert_journal(
+    journal: AlertJournal, configs: List[ConfigData], compact: bool = True
+) -> None:
+    """
+    Send the alerts a previous run recorded but did not deliver, then compact the
+    journal if asked to. Alerts that still cannot be sent stay pending and are
+    retried with back-off; alerts for clusters no longer configured are dropped.
+    """
+    config_by_cluster = {config_data.cluster_name: config_data for config_data in configs}
+
+    for entry in journal.pending():
+        config_data = config_by_cluster.get(entry['cluster_name'])
+        if config_data is None:
+            print(f"WARNING: {entry['cluster_name']} is not configured. Dropping alert.")
+            journal.mark_done(entry['id'])
+            continue
+        if not journal.retry_due(entry['id']):
+            continue
+        try:
+            EmailMessage(config_data, entry['subject'], entry['body']).send()
+        except Exception as err:
+            print(f'ERROR: {err}\nUnable to resend journaled alert. Keeping it.')
+            journal.retry_later(entry['id'])
+            continue
+        journal.mark_done(entry['id'])
+        print(f"JOURNALED ALERT SENT for {entry['cluster_name']}.")
+
+    if compact:
+        journal.compact()
+
+
+def generate_script_problem_email(error: str, config_data: ConfigData) -> NoReturn:
     """
-    Build and send script problem alert email.
+    Build and send script problem alert email, then raise ClusterProblem whether or
+    not it was sent.
     """
     subject = f'Script problem for Qumulo cluster: {config_data.cluster_name}'
     body = (
         'The cluster_device_monitor.py script has encountered a '
-        'problem and the script has stopped running.<br>'
+        'problem and was unable to check the cluster.<br>'
         "Please check the machine's connection to the cluster over "
         'the required port (default 8000).<br>'
         f'config_data.json - cluster IP: {config_data.cluster_address}<br>'
@@ -400,11 +1960,21 @@ def generate_script_problem_email(error: str, config_data: ConfigData) -> None:
 
     try:
         eml.send()
-        sys.exit(f'EMAIL SENT.\n\nError Details: {error}. \nExiting...')
     except Exception as err:
-        sys.exit(
+        raise ClusterProblem(
             f'ERROR: {err}\nUnable to send email. Check connection to SMTP server. Exiting...'
         )
+    raise ClusterProblem(f'EMAIL SENT.\n\nError Details: {error}. \nExiting...')
+
+
+def report_script_problem(error: str, config_data: ConfigData) -> None:
+    """
+    Send the script problem alert email without stopping the script.
+    """
+    try:
+        generate_script_problem_email(error, config_data)
+    except ClusterProblem as problem:
+        print(problem)
 
 
 #  __  __    _    ___ _   _
@@ -436,50 +2006,288 @@ def parse_args(argv: Sequence[str]) -> argparse.Namespace:
         help='Print the parsed representation of the config data.',
     )
 
-    return parser.parse_args(argv)
-
+    parser.add_argument(
+        '--snapshot-format',
+        choices=sorted(SNAPSHOT_FILES),
+        default='json',
+        help=(
+            'Format of the recorded cluster status. "compact" writes checksummed '
+            'per-device records; "json" writes cluster_status.json.'
+        ),
+    )
 
-def main(opts: argparse.Namespace) -> int:
-    config_data = load_and_parse_config(opts.config)
-    healthy = True
-    previous_file = 'cluster_status_previous.json'
+    parser.add_argument(
+        '--trends',
+        action='store_true',
+        help=(
+            'Fold every poll into rolling drive, node and disk model aggregates in '
+            f'{TRENDS_FILE} and report rising drive failure rates, degraded nodes '
+            'and failure rates per disk model.'
+        ),
+    )
 
-    if opts.print_config_data:
-        print(config_data)
-        return 0
+    parser.add_argument(
+        '--replay',
+        metavar='DIRECTORY',
+        help=(
+            'Replay the recorded cluster status snapshots (.json or .snap) in '
+            'DIRECTORY, in file name order, and report the alerts that would have '
+            'been sent and the throughput. No REST or SMTP traffic is generated.'
+        ),
+    )
 
-    check_cluster_connectivity(config_data)
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help=(
+            'Keep running and poll the cluster on an adaptive interval instead of '
+            'exiting after a single check.'
+        ),
+    )
 
-    # CHECK AND RECORD CLUSTER STATUS
-    rest_client = cluster_login(config_data)
-    assert rest_client is not None
-    status_of_nodes = retrieve_status_of_cluster_devices(
-        rest_client, config_data, 'nodes'
+    parser.add_argument(
+        '--http-port',
+        type=int,
+        help=(
+            'In --daemon mode, serve the latest status of every cluster as JSON at '
+            '/status.json and as HTML at / on this port.'
+        ),
     )
-    status_of_drives = retrieve_status_of_cluster_devices(
-        rest_client, config_data, 'drives'
+
+    parser.add_argument(
+        '--http-address',
+        default='127.0.0.1',
+        help='Address the status API listens on. Defaults to localhost only.',
     )
-    status_of_nodes['drives'] = status_of_drives['drives']
-    cluster_status = status_of_nodes
-    preserve_cluster_status(cluster_status)
-    alert_data, healthy = check_for_unhealthy_objects(cluster_status)
+
+    return parser.parse_args(argv)
+
+
+def poll_cluster(
+    config_data: ConfigData,
+    snapshot_format: str,
+    rest_client: Optional[RestClient] = None,
+    trends: Optional[DeviceTrends] = None,
+    status_board: Optional[StatusBoard] = None,
+    journal: Optional[AlertJournal] = None,
+) -> Tuple[bool, bool]:
+    """
+    Record the cluster status and alert on new unhealthy devices.
+    Returns (healthy, changed).
+
+    A due alert is recorded in the journal before the new status replaces the
+    previous snapshot, so an alert is never lost once its status is recorded.
+    """
+    start = time.perf_counter()
+    last_snapshot = snapshot_files(snapshot_format, config_data.status_prefix)[0]
+
+    # CHECK CLUSTER STATUS
+    if rest_client is None:
+        check_cluster_connectivity(config_data)
+        rest_client = cluster_login(config_data)
+    assert rest_client is not None
+    cluster_status = retrieve_cluster_status(rest_client, config_data)
+    if trends is not None:
+        trends.fold(config_data.cluster_name, cluster_status)
 
     # PREVIOUS_STATUS LOGIC
-    if os.path.exists(previous_file):
-        previous_status = load_json(previous_file)
-        changed = cluster_status != previous_status
-        if not changed:
-            healthy = True
+    changed = True
+    if os.path.exists(last_snapshot):
+        try:
+            changed = snapshot_changed(cluster_status, last_snapshot, snapshot_format)
+        except (OSError, ValueError) as err:
+            print(f'WARNING: {err}\nIgnoring invalid snapshot {last_snapshot}.')
+    alert_data, notices = check_cluster_health(cluster_status, config_data.health_rules)
+    healthy = not alert_data
+    if status_board is not None:
+        status_board.update(
+            config_data.cluster_name,
+            cluster_status,
+            alert_data,
+            time.perf_counter() - start,
+            notices,
+        )
 
     # UNHEALTHY DEVICE ALERTING
-    if not healthy:
+    email_alert, entry_id = None, None
+    if not healthy and changed:
         email_alert = populate_alert_email_body(alert_data, rest_client, config_data)
-        generate_event_alert_email(config_data, email_alert)
-        print('Script will restart if on cronjob schedule...')
+        if journal is not None:
+            entry_id = journal.record_pending(
+                config_data.cluster_name, event_alert_subject(config_data), email_alert
+            )
+
+    # RECORD CLUSTER STATUS
+    preserve_cluster_status(cluster_status, snapshot_format, config_data.status_prefix)
+    delete_previous_cluster_status(snapshot_format, config_data.status_prefix)
+    if email_alert is not None:
+        generate_event_alert_email(config_data, email_alert, journal, entry_id)
+
+    return healthy, changed
+
+
+def sync_cluster_monitors(
+    monitors: Dict[str, ClusterMonitor],
+    clusters: Dict[str, ConfigData],
+    status_board: Optional[StatusBoard] = None,
+    trends: Optional[DeviceTrends] = None,
+) -> None:
+    """
+    Start polling added clusters and stop polling removed ones. Monitors of clusters
+    whose connection settings did not change keep their session and schedule, and
+    only pick up the new settings.
+    """
+    for cluster_name in list(monitors):
+        if cluster_name not in clusters:
+            del monitors[cluster_name]
+            if status_board is not None:
+                status_board.remove(cluster_name)
+            print(f'Stopped polling {cluster_name}.')
+    if trends is not None:
+        trends.retain_clusters(list(clusters))
+
+    for cluster_name, config_data in clusters.items():
+        monitor = monitors.get(cluster_name)
+        if monitor is None or not monitor.same_connection(config_data):
+            monitors[cluster_name] = ClusterMonitor(config_data)
+            print(f'Started polling {cluster_name}.')
+        elif monitor.config_data != config_data:
+            monitor.update_config(config_data)
+            print(f'Updated settings of {cluster_name}.')
+
+
+def run_daemon(
+    watcher: ConfigWatcher,
+    snapshot_format: str,
+    trends: Optional[DeviceTrends] = None,
+    status_board: Optional[StatusBoard] = None,
+    journal: Optional[AlertJournal] = None,
+) -> int:
+    """
+    Poll every configured cluster forever, adapting each interval to the health of
+    the cluster and picking up config changes without a restart. Undelivered alerts
+    in the journal are retried on every pass and the journal is compacted every
+    JOURNAL_COMPACT_INTERVAL seconds.
+    """
+    monitors: Dict[str, ClusterMonitor] = {}
+    sync_cluster_monitors(monitors, watcher.clusters, status_board, trends)
+    next_config_check = time.monotonic() + CONFIG_RELOAD_INTERVAL
+    next_journal_compact = time.monotonic()
+
+    while True:
+        if time.monotonic() >= next_config_check:
+            if watcher.reload_if_changed():
+                sync_cluster_monitors(monitors, watcher.clusters, status_board, trends)
+            next_config_check = time.monotonic() + CONFIG_RELOAD_INTERVAL
+
+        if journal is not None:
+            compact = time.monotonic() >= next_journal_compact
+            replay_alert_journal(journal, list(watcher.clusters.values()), compact)
+            if compact:
+                next_journal_compact = time.monotonic() + JOURNAL_COMPACT_INTERVAL
+
+        for cluster_name, monitor in monitors.items():
+            if monitor.next_poll <= time.monotonic():
+                interval = monitor.poll(snapshot_format, trends, status_board, journal)
+                print(f'Next poll of {cluster_name} in {interval} seconds.')
+                if trends is not None:
+                    record_device_trends(trends)
+
+        next_wakeup = min(
+            [monitor.next_poll for monitor in monitors.values()] + [next_config_check]
+        )
+        time.sleep(max(0.0, next_wakeup - time.monotonic()))
+
+
+def run_replay(opts: argparse.Namespace) -> int:
+    """
+    Replay recorded snapshots, using the health rules from the config if present.
+    """
+    if not os.path.isdir(opts.replay):
+        sys.exit(f'ERROR: Replay directory {opts.replay} not found. Exiting...')
+    health_rules = None
+    if os.path.exists(opts.config):
+        health_rules = load_and_parse_config(opts.config)[0].health_rules
+    print_replay_report(*replay_snapshots(opts.replay, health_rules))
 
-    delete_previous_cluster_status()
     return 0
 
 
+def start_daemon(
+    opts: argparse.Namespace, trends: Optional[DeviceTrends], journal: AlertJournal
+) -> int:
+    """
+    Load the config, start the status server if asked to and run the daemon.
+    """
+    watcher = ConfigWatcher(opts.config)
+    if not watcher.reload_if_changed():
+        sys.exit('ERROR: Unable to load or parse config. Exiting...')
+    status_board = None
+    if opts.http_port is not None:
+        status_board = StatusBoard()
+        start_status_server(status_board, opts.http_port, opts.http_address)
+
+    return run_daemon(watcher, opts.snapshot_format, trends, status_board, journal)
+
+
+def run_cron(
+    opts: argparse.Namespace, trends: Optional[DeviceTrends], journal: AlertJournal
+) -> int:
+    """
+    Poll every configured cluster once. A cluster that cannot be checked does not
+    stop the others, but makes the run exit with an error at the end.
+    """
+    configs = load_and_parse_config(opts.config)
+    replay_alert_journal(journal, configs)
+    if trends is not None:
+        trends.retain_clusters([config_data.cluster_name for config_data in configs])
+
+    failed_clusters = []
+    for config_data in configs:
+        try:
+            healthy, changed = poll_cluster(
+                config_data, opts.snapshot_format, trends=trends, journal=journal
+            )
+        except ClusterProblem as problem:
+            print(problem)
+            failed_clusters.append(config_data.cluster_name)
+            continue
+        except Exception as err:
+            print(f'ERROR: {err}\nPolling {config_data.cluster_name} failed.')
+            report_script_problem(str(err), config_data)
+            failed_clusters.append(config_data.cluster_name)
+            continue
+        if not healthy and changed:
+            print('Script will restart if on cronjob schedule...')
+
+    if trends is not None:
+        record_device_trends(trends)
+
+    if failed_clusters:
+        sys.exit(f"ERROR: Unable to check {', '.join(failed_clusters)}. Exiting...")
+
+    return 0
+
+
+def main(opts: argparse.Namespace) -> int:
+    if opts.replay:
+        return run_replay(opts)
+
+    if opts.print_config_data:
+        for config_data in load_and_parse_config(opts.config):
+            print(config_data)
+        return 0
+
+    if opts.http_port is not None and not opts.daemon:
+        sys.exit('ERROR: --http-port requires --daemon. Exiting...')
+
+    trends = load_device_trends() if opts.trends else None
+    journal = AlertJournal()
+
+    if opts.daemon:
+        return start_daemon(opts, trends, journal)
+    return run_cron(opts, trends, journal)
+
+
 if __name__ == '__main__':
     sys.exit(main(parse_args(sys.argv[1:])))
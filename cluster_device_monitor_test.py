@@ -17,25 +17,59 @@
 import json
 import os
 import unittest
+import urllib.error
+import urllib.request
 
 from unittest import mock
 from qumulo.lib.request import RequestError
 from typing import Any, Dict
 
 from cluster_device_monitor import (
+    AlertJournal,
     check_cluster_connectivity,
+    check_cluster_health,
     check_for_unhealthy_objects,
     cluster_login,
+    ClusterMonitor,
+    ClusterProblem,
+    compact_snapshot_matches,
+    compile_health_rules,
     ConfigData,
+    ConfigWatcher,
     delete_previous_cluster_status,
+    DeviceTrends,
     EmailMessage,
     generate_script_problem_email,
     generate_event_alert_email,
+    iter_compact_snapshot,
+    JOURNAL_RETRY_MIN,
+    load_device_trends,
+    load_session_tokens,
+    record_device_trends,
+    main,
+    parse_args,
+    parse_cluster_configs,
     parse_config,
+    poll_cluster,
+    PollScheduler,
     populate_alert_email_body,
     preserve_cluster_status,
+    print_replay_report,
     qq_api_query,
+    read_snapshot,
+    replay_alert_journal,
+    replay_snapshots,
+    retrieve_cluster_status,
     retrieve_status_of_cluster_devices,
+    run_daemon,
+    save_device_trends,
+    save_session_tokens,
+    start_status_server,
+    StatusBoard,
+    sync_cluster_monitors,
+    token_cache_key,
+    TREND_WINDOW,
+    validate_config,
 )
 
 
@@ -68,6 +102,10 @@ CONFIG_DATA = ConfigData(
 EML = EmailMessage(CONFIG_DATA, 'subject', 'body')
 
 
+def config_with_cluster_settings(**settings: Any) -> Dict[str, Any]:
+    return dict(CONFIG, cluster_settings=dict(CONFIG['cluster_settings'], **settings))
+
+
 class ParseConfigTest(unittest.TestCase):
     def test_default_config_loads(self) -> None:
         config = parse_config(CONFIG)
@@ -88,6 +126,297 @@ class ParseConfigTest(unittest.TestCase):
         with self.assertRaisesRegex(SystemExit, 'Configuration element missing.'):
             parse_config({'a': 'b'})
 
+    def test_poll_interval_bounds_load(self) -> None:
+        config = parse_config(
+            config_with_cluster_settings(poll_interval_min=30, poll_interval_max=600)
+        )
+        self.assertEqual(config.poll_interval_min, 30)
+        self.assertEqual(config.poll_interval_max, 600)
+
+
+class ValidateConfigTest(unittest.TestCase):
+    def test_default_config_is_valid(self) -> None:
+        self.assertEqual(validate_config(CONFIG), [])
+
+    def test_missing_element_reported(self) -> None:
+        config_file = json.loads(json.dumps(CONFIG))
+        del config_file['cluster_settings']['username']
+        self.assertEqual(
+            validate_config(config_file),
+            ['cluster_settings: Configuration element missing: username'],
+        )
+
+    def test_access_token_replaces_password(self) -> None:
+        config_file = json.loads(json.dumps(CONFIG))
+        del config_file['cluster_settings']['password']
+        self.assertEqual(
+            validate_config(config_file),
+            ['cluster_settings: Configuration element missing: password or access_token'],
+        )
+        config_file['cluster_settings']['access_token'] = 'access-v1:abc'
+        self.assertEqual(validate_config(config_file), [])
+        self.assertEqual(parse_config(config_file).access_token, 'access-v1:abc')
+
+    def test_wrong_type_reported(self) -> None:
+        config_file = json.loads(json.dumps(CONFIG))
+        config_file['cluster_settings']['rest_port'] = 'eight thousand'
+        config_file['email_settings']['mail_to'] = 'storage_admins@qumulo.com'
+        self.assertEqual(
+            validate_config(config_file),
+            [
+                'cluster_settings: rest_port must be of type int.',
+                'email_settings: mail_to must be of type list.',
+            ],
+        )
+
+    def test_non_positive_poll_intervals_reported(self) -> None:
+        for settings, error in (
+            ({'poll_interval_min': 0}, 'poll_interval_min must be a positive integer.'),
+            ({'poll_interval_max': -5}, 'poll_interval_max must be a positive integer.'),
+            (
+                {'poll_interval_min': 600, 'poll_interval_max': 60},
+                'poll_interval_min must not exceed poll_interval_max.',
+            ),
+        ):
+            self.assertIn(
+                f'cluster_settings: {error}',
+                validate_config(config_with_cluster_settings(**settings)),
+            )
+
+    def test_cluster_name_with_path_separator_reported(self) -> None:
+        for cluster_name in ('../../tmp/x', 'a\\b', ''):
+            self.assertEqual(
+                validate_config(config_with_cluster_settings(cluster_name=cluster_name)),
+                [
+                    'cluster_settings: cluster_name must not be empty or contain '
+                    'path separators.'
+                ],
+            )
+
+    def test_duplicate_cluster_names_reported(self) -> None:
+        config_file = dict(
+            CONFIG,
+            cluster_settings=[CONFIG['cluster_settings'], CONFIG['cluster_settings']],
+        )
+        self.assertIn(
+            'cluster_settings: cluster_name values must be unique.',
+            validate_config(config_file),
+        )
+
+
+class ParseClusterConfigsTest(unittest.TestCase):
+    def test_single_cluster_keeps_default_status_files(self) -> None:
+        configs = parse_cluster_configs(CONFIG)
+        self.assertEqual(len(configs), 1)
+        self.assertEqual(configs[0].status_prefix, '')
+
+    def test_cluster_list_gets_status_prefixes(self) -> None:
+        other_cluster = config_with_cluster_settings(cluster_name='TeaTime')
+        config_file = dict(
+            CONFIG,
+            cluster_settings=[
+                CONFIG['cluster_settings'],
+                other_cluster['cluster_settings'],
+            ],
+        )
+        configs = parse_cluster_configs(config_file)
+        self.assertEqual(
+            [config.cluster_name for config in configs], ['CoffeeTime', 'TeaTime']
+        )
+        self.assertEqual(
+            [config.status_prefix for config in configs], ['CoffeeTime_', 'TeaTime_']
+        )
+
+
+@mock.patch('builtins.print')
+@mock.patch('cluster_device_monitor.replay_alert_journal')
+@mock.patch('cluster_device_monitor.poll_cluster')
+@mock.patch('cluster_device_monitor.load_and_parse_config')
+class CronMainTest(unittest.TestCase):
+    def test_failed_cluster_does_not_stop_others(
+        self,
+        mock_load: mock.MagicMock,
+        mock_poll: mock.MagicMock,
+        _mock_replay: mock.MagicMock,
+        _mock_print: mock.MagicMock,
+    ) -> None:
+        other_config = parse_config(config_with_cluster_settings(cluster_name='TeaTime'))
+        mock_load.return_value = [CONFIG_DATA, other_config]
+        mock_poll.side_effect = [ClusterProblem('EMAIL SENT.'), (True, False)]
+        with self.assertRaisesRegex(SystemExit, 'Unable to check CoffeeTime.'):
+            main(parse_args([]))
+        self.assertEqual(mock_poll.call_count, 2)
+        self.assertIs(mock_poll.call_args[0][0], other_config)
+
+
+class ConfigWatcherTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.config_path = 'config_watcher_test.json'
+        self.write_config(CONFIG)
+
+    def write_config(self, config_file: Dict[str, Any]) -> None:
+        with open(self.config_path, 'w') as file:
+            json.dump(config_file, file)
+        # Force a new mtime even on file systems with coarse timestamps
+        stat = os.stat(self.config_path)
+        os.utime(self.config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def test_loads_once_until_file_changes(self) -> None:
+        watcher = ConfigWatcher(self.config_path)
+        self.assertTrue(watcher.reload_if_changed())
+        self.assertFalse(watcher.reload_if_changed())
+        self.assertEqual(list(watcher.clusters), ['CoffeeTime'])
+
+        self.write_config(config_with_cluster_settings(cluster_name='TeaTime'))
+        self.assertTrue(watcher.reload_if_changed())
+        self.assertEqual(list(watcher.clusters), ['TeaTime'])
+
+    def test_invalid_config_keeps_cached_config(self) -> None:
+        watcher = ConfigWatcher(self.config_path)
+        watcher.reload_if_changed()
+        self.write_config({'a': 'b'})
+        with mock.patch('builtins.print'):
+            self.assertFalse(watcher.reload_if_changed())
+        self.assertEqual(list(watcher.clusters), ['CoffeeTime'])
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.config_path):
+            os.remove(self.config_path)
+
+
+@mock.patch('builtins.print')
+class SyncClusterMonitorsTest(unittest.TestCase):
+    def test_unchanged_cluster_keeps_monitor(self, _mock_print: mock.MagicMock) -> None:
+        monitors: Dict[str, Any] = {}
+        sync_cluster_monitors(monitors, {'CoffeeTime': CONFIG_DATA})
+        monitor = monitors['CoffeeTime']
+        sync_cluster_monitors(monitors, {'CoffeeTime': parse_config(CONFIG)})
+        self.assertIs(monitors['CoffeeTime'], monitor)
+
+    def test_added_and_removed_clusters(self, _mock_print: mock.MagicMock) -> None:
+        monitors: Dict[str, Any] = {}
+        sync_cluster_monitors(monitors, {'CoffeeTime': CONFIG_DATA})
+        other_config = parse_config(config_with_cluster_settings(cluster_name='TeaTime'))
+        sync_cluster_monitors(monitors, {'TeaTime': other_config})
+        self.assertEqual(list(monitors), ['TeaTime'])
+
+    def test_changed_cluster_gets_new_monitor(self, _mock_print: mock.MagicMock) -> None:
+        monitors: Dict[str, Any] = {}
+        sync_cluster_monitors(monitors, {'CoffeeTime': CONFIG_DATA})
+        monitor = monitors['CoffeeTime']
+        changed_config = parse_config(config_with_cluster_settings(rest_port=9000))
+        sync_cluster_monitors(monitors, {'CoffeeTime': changed_config})
+        self.assertIsNot(monitors['CoffeeTime'], monitor)
+
+    def test_changed_email_settings_keep_session_and_schedule(
+        self, _mock_print: mock.MagicMock
+    ) -> None:
+        monitors: Dict[str, Any] = {}
+        sync_cluster_monitors(monitors, {'CoffeeTime': CONFIG_DATA})
+        monitor = monitors['CoffeeTime']
+        monitor.rest_client = mock.sentinel.rest_client
+        monitor.next_poll = 123.0
+        changed_config = parse_config(
+            dict(
+                CONFIG,
+                email_settings=dict(CONFIG['email_settings'], mail_to=['ops@qumulo.com']),
+                health_rules=[{'devices': 'drives', 'match': {'state': 'dead'}}],
+            )
+        )
+        sync_cluster_monitors(monitors, {'CoffeeTime': changed_config})
+        self.assertIs(monitors['CoffeeTime'], monitor)
+        self.assertIs(monitor.config_data, changed_config)
+        self.assertIs(monitor.rest_client, mock.sentinel.rest_client)
+        self.assertEqual(monitor.next_poll, 123.0)
+
+
+@mock.patch('builtins.print')
+@mock.patch('cluster_device_monitor.report_script_problem')
+@mock.patch('cluster_device_monitor.poll_cluster')
+@mock.patch('cluster_device_monitor.cluster_login')
+@mock.patch('cluster_device_monitor.check_cluster_connectivity')
+class ClusterMonitorTest(unittest.TestCase):
+    def test_failed_poll_keeps_running_at_min_interval(
+        self,
+        _mock_connectivity: mock.MagicMock,
+        mock_login: mock.MagicMock,
+        mock_poll: mock.MagicMock,
+        mock_report: mock.MagicMock,
+        _mock_print: mock.MagicMock,
+    ) -> None:
+        monitor = ClusterMonitor(CONFIG_DATA)
+        mock_poll.return_value = (True, False)
+        self.assertEqual(monitor.poll('json'), 120)
+
+        mock_poll.side_effect = RequestError(503, 'Service Unavailable')
+        self.assertEqual(monitor.poll('json'), 60)
+        mock_report.assert_called_once()
+        self.assertIsNone(monitor.rest_client)
+
+        mock_poll.side_effect = None
+        monitor.poll('json')
+        self.assertEqual(mock_login.call_count, 2)
+
+    def test_reported_problem_does_not_exit(
+        self,
+        _mock_connectivity: mock.MagicMock,
+        _mock_login: mock.MagicMock,
+        mock_poll: mock.MagicMock,
+        mock_report: mock.MagicMock,
+        _mock_print: mock.MagicMock,
+    ) -> None:
+        mock_poll.side_effect = ClusterProblem('EMAIL SENT.')
+        monitor = ClusterMonitor(CONFIG_DATA)
+        self.assertEqual(monitor.poll('json'), 60)
+        mock_report.assert_not_called()
+        self.assertIsNone(monitor.rest_client)
+
+    def test_failed_poll_shown_on_status_board(
+        self,
+        _mock_connectivity: mock.MagicMock,
+        _mock_login: mock.MagicMock,
+        mock_poll: mock.MagicMock,
+        _mock_report: mock.MagicMock,
+        _mock_print: mock.MagicMock,
+    ) -> None:
+        board = StatusBoard()
+        status = {'nodes': [{'id': 1, 'node_status': 'online'}], 'drives': []}
+        board.update('CoffeeTime', status, {}, 0.5)
+        mock_poll.side_effect = RequestError(503, 'Service Unavailable')
+        ClusterMonitor(CONFIG_DATA).poll('json', status_board=board)
+        cluster = board.clusters['CoffeeTime']
+        self.assertFalse(cluster['healthy'])
+        self.assertIn('Error 503', cluster['error'])
+        self.assertNotEqual(cluster['last_attempt'], cluster['last_poll'])
+        self.assertEqual(cluster['nodes'], status['nodes'])
+        self.assertIn(b'CoffeeTime: POLL FAILED', board.document('html')[0])
+
+
+class PollSchedulerTest(unittest.TestCase):
+    def test_healthy_unchanged_backs_off_to_max(self) -> None:
+        scheduler = PollScheduler(60, 300)
+        intervals = [scheduler.next_interval(True, False) for _ in range(5)]
+        self.assertEqual(intervals, [120, 240, 300, 300, 300])
+
+    def test_unhealthy_tightens_to_min(self) -> None:
+        scheduler = PollScheduler(60, 300)
+        scheduler.next_interval(True, False)
+        scheduler.next_interval(True, False)
+        self.assertEqual(scheduler.next_interval(False, True), 60)
+        self.assertEqual(scheduler.next_interval(False, False), 60)
+
+    def test_recently_recovered_stays_at_min(self) -> None:
+        scheduler = PollScheduler(60, 300, recovery_polls=2)
+        scheduler.next_interval(False, True)
+        self.assertEqual(scheduler.next_interval(True, True), 60)
+        self.assertEqual(scheduler.next_interval(True, False), 60)
+        self.assertEqual(scheduler.next_interval(True, False), 120)
+
+    def test_changed_tightens_to_min(self) -> None:
+        scheduler = PollScheduler(60, 300)
+        scheduler.next_interval(True, False)
+        self.assertEqual(scheduler.next_interval(True, True), 60)
+
 
 @mock.patch(
     'cluster_device_monitor.generate_script_problem_email'
@@ -126,9 +455,21 @@ class DeletePreviousStatusFileTest(unittest.TestCase):
 )
 @mock.patch('cluster_device_monitor.RestClient')
 class ClusterLoginTest(unittest.TestCase):
+    def setUp(self) -> None:
+        token_cache = mock.patch(
+            'cluster_device_monitor.TOKEN_CACHE_FILE', 'session_token_cache_test.json'
+        )
+        token_cache.start()
+        self.addCleanup(token_cache.stop)
+
+    def tearDown(self) -> None:
+        if os.path.exists('session_token_cache_test.json'):
+            os.remove('session_token_cache_test.json')
+
     def test_cluster_login(
-        self, _mock_rest: mock.MagicMock, mock_email: mock.MagicMock
+        self, mock_rest: mock.MagicMock, mock_email: mock.MagicMock
     ) -> None:
+        mock_rest.return_value.login.return_value.bearer_token = 'session-token'
         cluster_login(CONFIG_DATA)
         mock_email.assert_not_called()
 
@@ -146,6 +487,92 @@ class ClusterLoginTest(unittest.TestCase):
         cluster_login(CONFIG_DATA)
         mock_email.assert_called_once()
 
+    def test_login_caches_session_token(
+        self, mock_rest: mock.MagicMock, _mock_email: mock.MagicMock
+    ) -> None:
+        mock_rest.return_value.login.return_value.bearer_token = 'session-token'
+        cluster_login(CONFIG_DATA)
+        self.assertEqual(
+            os.stat('session_token_cache_test.json').st_mode & 0o777, 0o600
+        )
+
+        mock_rest.reset_mock()
+        cluster_login(CONFIG_DATA)
+        mock_rest.return_value.login.assert_not_called()
+        self.assertEqual(
+            mock_rest.call_args[1]['credentials'].bearer_token, 'session-token'
+        )
+
+    def test_access_token_skips_login(
+        self, mock_rest: mock.MagicMock, _mock_email: mock.MagicMock
+    ) -> None:
+        config_data = parse_config(
+            config_with_cluster_settings(access_token='access-v1:abc')
+        )
+        cluster_login(config_data)
+        mock_rest.return_value.login.assert_not_called()
+        self.assertEqual(
+            mock_rest.call_args[1]['credentials'].bearer_token, 'access-v1:abc'
+        )
+        self.assertFalse(os.path.exists('session_token_cache_test.json'))
+
+    def test_expired_session_token_logs_in_again(
+        self, mock_rest: mock.MagicMock, mock_email: mock.MagicMock
+    ) -> None:
+        rest_client = mock_rest.return_value
+        rest_client.cluster.list_nodes.side_effect = [
+            RequestError(401, 'Unauthorized'),
+            [],
+        ]
+        rest_client.login.return_value.bearer_token = 'new-session-token'
+        retrieve_cluster_status(rest_client, CONFIG_DATA)
+        rest_client.login.assert_called_once_with('admin', 'Admin123')
+        self.assertEqual(rest_client.cluster.list_nodes.call_count, 2)
+        mock_email.assert_not_called()
+
+    def test_expired_session_token_on_any_request_logs_in_again(
+        self, mock_rest: mock.MagicMock, mock_email: mock.MagicMock
+    ) -> None:
+        rest_client = mock_rest.return_value
+        rest_client.login.return_value.bearer_token = 'new-session-token'
+        rest_client.cluster.get_cluster_slots_status.side_effect = [
+            RequestError(401, 'Unauthorized'),
+            [],
+        ]
+        rest_client.version.version.side_effect = [
+            RequestError(401, 'Unauthorized'),
+            {'revision_id': 'Qumulo Core 4.0.1'},
+        ]
+        retrieve_cluster_status(rest_client, CONFIG_DATA)
+        self.assertEqual(
+            qq_api_query(rest_client, CONFIG_DATA, 'qq_version'), 'Qumulo Core 4.0.1'
+        )
+        self.assertEqual(rest_client.login.call_count, 2)
+        mock_email.assert_not_called()
+
+    def test_other_request_errors_are_reported(
+        self, mock_rest: mock.MagicMock, mock_email: mock.MagicMock
+    ) -> None:
+        rest_client = mock_rest.return_value
+        rest_client.cluster.list_nodes.side_effect = RequestError(503, 'Unavailable')
+        mock_email.side_effect = ClusterProblem('EMAIL SENT.')
+        with self.assertRaises(ClusterProblem):
+            retrieve_cluster_status(rest_client, CONFIG_DATA)
+        mock_email.assert_called_once()
+        rest_client.login.assert_not_called()
+
+    def test_token_cache_owned_by_another_user_is_ignored(
+        self, _mock_rest: mock.MagicMock, _mock_email: mock.MagicMock
+    ) -> None:
+        save_session_tokens({token_cache_key(CONFIG_DATA): 'session-token'})
+        self.assertEqual(
+            load_session_tokens(), {token_cache_key(CONFIG_DATA): 'session-token'}
+        )
+        with mock.patch('os.getuid', return_value=os.getuid() + 1), mock.patch(
+            'builtins.print'
+        ):
+            self.assertEqual(load_session_tokens(), {})
+
 
 @mock.patch(
     'cluster_device_monitor.generate_script_problem_email'
@@ -264,9 +691,129 @@ class PreserveClusterStatusTest(unittest.TestCase):
             self.assertEqual(json_file['drives'][0]['disk_serial_number'], '1234')
             self.assertEqual(json_file['drives'][0]['capacity'], '10467934208')
 
+    def test_compact_snapshot_round_trips(self) -> None:
+        preserve_cluster_status(self.test_cluster_status, 'compact')
+        self.assertIn('cluster_status.snap', os.listdir())
+        self.assertEqual(
+            read_snapshot('cluster_status.snap', 'compact'), self.test_cluster_status
+        )
+
+    def test_compact_snapshot_reads_device_by_device(self) -> None:
+        preserve_cluster_status(self.test_cluster_status, 'compact')
+        records = list(iter_compact_snapshot('cluster_status.snap'))
+        self.assertEqual(
+            records,
+            [
+                ('nodes', self.test_cluster_status['nodes'][0]),
+                ('drives', self.test_cluster_status['drives'][0]),
+            ],
+        )
+
+    def test_compact_snapshot_compared_record_by_record(self) -> None:
+        preserve_cluster_status(self.test_cluster_status, 'compact')
+        self.assertTrue(
+            compact_snapshot_matches(self.test_cluster_status, 'cluster_status.snap')
+        )
+        changed_drive = dict(self.test_cluster_status['drives'][0], state='dead')
+        for cluster_status in (
+            dict(self.test_cluster_status, drives=[changed_drive]),
+            dict(self.test_cluster_status, drives=[]),
+            dict(self.test_cluster_status, drives=[changed_drive, changed_drive]),
+        ):
+            self.assertFalse(
+                compact_snapshot_matches(cluster_status, 'cluster_status.snap')
+            )
+
+    def test_snapshot_written_atomically(self) -> None:
+        preserve_cluster_status(self.test_cluster_status, 'compact')
+        with mock.patch(
+            'cluster_device_monitor.write_compact_snapshot', side_effect=OSError()
+        ):
+            with self.assertRaises(OSError):
+                preserve_cluster_status({'nodes': [], 'drives': []}, 'compact')
+        self.assertTrue(
+            compact_snapshot_matches(self.test_cluster_status, 'cluster_status.snap')
+        )
+        self.assertNotIn('cluster_status_previous.snap', os.listdir())
+
+    def test_corrupt_compact_snapshot_raises_error(self) -> None:
+        preserve_cluster_status(self.test_cluster_status, 'compact')
+        with open('cluster_status.snap', 'r+b') as file:
+            file.seek(-2, os.SEEK_END)
+            file.write(b'XX')
+        with self.assertRaisesRegex(ValueError, 'Checksum mismatch'):
+            read_snapshot('cluster_status.snap', 'compact')
+
+    @mock.patch('cluster_device_monitor.retrieve_cluster_status')
+    def test_poll_ignores_corrupt_previous_snapshot(
+        self, mock_retrieve: mock.MagicMock
+    ) -> None:
+        with open('cluster_status.snap', 'wb') as file:
+            file.write(b'not a snapshot')
+        mock_retrieve.return_value = self.test_cluster_status
+        config_data = parse_cluster_configs(config_with_cluster_settings())[0]
+        with mock.patch('builtins.print') as mock_print:
+            healthy, _changed = poll_cluster(config_data, 'compact', mock.MagicMock())
+        self.assertTrue(healthy)
+        self.assertIn('Ignoring invalid snapshot', mock_print.call_args[0][0])
+        self.assertEqual(
+            read_snapshot('cluster_status.snap', 'compact'), self.test_cluster_status
+        )
+
+    @mock.patch('cluster_device_monitor.EmailMessage.send')
+    @mock.patch('cluster_device_monitor.retrieve_cluster_status')
+    def test_poll_journals_alert_before_lookups_can_fail(
+        self, mock_retrieve: mock.MagicMock, mock_email: mock.MagicMock
+    ) -> None:
+        dead_drive = dict(self.test_cluster_status['drives'][0], state='dead')
+        mock_retrieve.side_effect = [
+            self.test_cluster_status,
+            dict(self.test_cluster_status, drives=[dead_drive]),
+        ]
+        mock_email.side_effect = Exception()
+        rest_client = mock.MagicMock()
+        journal = AlertJournal('alert_journal_test.jsonl')
+        config_data = parse_cluster_configs(config_with_cluster_settings())[0]
+        with mock.patch('builtins.print'):
+            poll_cluster(config_data, 'compact', rest_client, journal=journal)
+            rest_client.cluster.get_cluster_conf.side_effect = TimeoutError()
+            with self.assertRaisesRegex(SystemExit, 'Check connection to SMTP server.'):
+                poll_cluster(config_data, 'compact', rest_client, journal=journal)
+        pending = journal.pending()
+        self.assertEqual(len(pending), 1)
+        self.assertIn('Cluster name: CoffeeTime', pending[0]['body'])
+        self.assertIn('Drive Status: dead', pending[0]['body'])
+        self.assertEqual(
+            read_snapshot('cluster_status.snap', 'compact')['drives'], [dead_drive]
+        )
+
+    @mock.patch('cluster_device_monitor.EmailMessage.send')
+    @mock.patch('cluster_device_monitor.retrieve_cluster_status')
+    def test_poll_sends_alert_without_cluster_details(
+        self, mock_retrieve: mock.MagicMock, mock_email: mock.MagicMock
+    ) -> None:
+        dead_drive = dict(self.test_cluster_status['drives'][0], state='dead')
+        mock_retrieve.return_value = dict(self.test_cluster_status, drives=[dead_drive])
+        rest_client = mock.MagicMock()
+        rest_client.version.version.side_effect = TimeoutError()
+        journal = AlertJournal('alert_journal_test.jsonl')
+        config_data = parse_cluster_configs(config_with_cluster_settings())[0]
+        with mock.patch('builtins.print') as mock_print:
+            healthy, _changed = poll_cluster(
+                config_data, 'compact', rest_client, journal=journal
+            )
+        self.assertFalse(healthy)
+        printed = [call[0][0] for call in mock_print.call_args_list]
+        self.assertTrue(any('Unable to look up cluster' in text for text in printed))
+        self.assertEqual(mock_email.call_count, 2)
+        self.assertEqual(journal.pending(), [])
+
     def tearDown(self) -> None:
-        if os.path.exists('cluster_status.json'):
-            os.remove('cluster_status.json')
+        if os.path.exists('alert_journal_test.jsonl'):
+            os.remove('alert_journal_test.jsonl')
+        for status_file in ('cluster_status.json', 'cluster_status.snap'):
+            if os.path.exists(status_file):
+                os.remove(status_file)
 
 
 class CheckForUnhealthyObjectsTest(unittest.TestCase):
@@ -285,13 +832,27 @@ class CheckForUnhealthyObjectsTest(unittest.TestCase):
     def test_unhealthy_node_returns_alert(self) -> None:
         status: Dict[str, Any] = {'nodes': [{'node_status': 'offline'}], 'drives': []}
         alert_data, healthy = check_for_unhealthy_objects(status)
-        self.assertEqual(alert_data, {'Event 1': status['nodes'][0]})
+        self.assertEqual(
+            alert_data,
+            {
+                'Event 1': dict(
+                    status['nodes'][0], severity='critical', rule='node offline'
+                )
+            },
+        )
         self.assertFalse(healthy)
 
     def test_unhealthy_drive_returns_alert(self) -> None:
         status: Dict[str, Any] = {'nodes': [], 'drives': [{'state': 'missing'}]}
         alert_data, healthy = check_for_unhealthy_objects(status)
-        self.assertEqual(alert_data, {'Event 1': status['drives'][0]})
+        self.assertEqual(
+            alert_data,
+            {
+                'Event 1': dict(
+                    status['drives'][0], severity='critical', rule='drive unhealthy'
+                )
+            },
+        )
         self.assertFalse(healthy)
 
     def test_unhealthy_node_and_drive_returns_alert(self) -> None:
@@ -301,11 +862,283 @@ class CheckForUnhealthyObjectsTest(unittest.TestCase):
         }
         alert_data, healthy = check_for_unhealthy_objects(status)
         self.assertEqual(
-            alert_data, {'Event 1': status['nodes'][0], 'Event 2': status['drives'][0]}
+            [event['rule'] for event in alert_data.values()],
+            ['node offline', 'drive unhealthy'],
         )
         self.assertFalse(healthy)
 
 
+class DeviceTrendsTest(unittest.TestCase):
+    def drive(self, drive_id: str, node_id: int, state: str) -> Dict[str, Any]:
+        return {
+            'id': drive_id,
+            'node_id': node_id,
+            'state': state,
+            'disk_model': 'Virtual_disk',
+        }
+
+    def status(self, *drives: Dict[str, Any]) -> Dict[str, Any]:
+        return {'nodes': [], 'drives': list(drives)}
+
+    def test_healthy_polls_report_nothing(self) -> None:
+        trends = DeviceTrends()
+        for poll in range(3):
+            trends.fold(
+                'CoffeeTime', self.status(self.drive('1.1', 1, 'healthy')), poll * 60
+            )
+        self.assertEqual(trends.report(), {})
+        self.assertEqual(trends.models['Virtual_disk']['drive_seconds'], 120)
+
+    def test_failing_drive_reports_rising_failures_and_model(self) -> None:
+        trends = DeviceTrends()
+        trends.fold('CoffeeTime', self.status(self.drive('1.1', 1, 'healthy')), 0)
+        trends.fold('CoffeeTime', self.status(self.drive('1.1', 1, 'dead')), 60)
+        trends.fold('CoffeeTime', self.status(self.drive('1.1', 1, 'dead')), 120)
+        self.assertEqual(
+            list(trends.report().values()),
+            [
+                'Drive CoffeeTime/1.1 (Virtual_disk): failures rising, 1 in the last '
+                '7 day(s) after 0 in the 7 before, 1 failure(s) in total',
+                'Disk model Virtual_disk: 50.0% of drive time unhealthy, 1 failure(s)',
+            ],
+        )
+
+    def test_drive_stops_rising_once_failures_slow_down(self) -> None:
+        trends = DeviceTrends()
+        trends.fold('CoffeeTime', self.status(self.drive('1.1', 1, 'dead')), 0)
+        trends.fold('CoffeeTime', self.status(self.drive('1.1', 1, 'healthy')), 60)
+        trends.fold(
+            'CoffeeTime',
+            self.status(self.drive('1.1', 1, 'healthy')),
+            TREND_WINDOW + 60,
+        )
+        stats = trends.drives['CoffeeTime/1.1']
+        self.assertEqual((stats['recent_failures'], stats['older_failures']), (0, 1))
+        self.assertNotIn('drive', ' '.join(trends.report()))
+
+    @mock.patch('cluster_device_monitor.save_device_trends')
+    def test_dead_drive_reported_once(self, _mock_save: mock.MagicMock) -> None:
+        trends = DeviceTrends()
+        with mock.patch('builtins.print') as mock_print:
+            for poll in range(200):
+                trends.fold(
+                    'CoffeeTime', self.status(self.drive('1.1', 1, 'dead')), poll * 60
+                )
+                record_device_trends(trends)
+        printed = [call[0][0] for call in mock_print.call_args_list]
+        self.assertEqual(len(printed), 2)
+        self.assertTrue(printed[0].startswith('TREND: Drive CoffeeTime/1.1'))
+        self.assertTrue(printed[1].startswith('TREND: Disk model Virtual_disk'))
+
+    def test_model_health_weighted_by_time(self) -> None:
+        percentages = []
+        for unhealthy_interval in (60, 900):
+            trends = DeviceTrends()
+            trends.fold('CoffeeTime', self.status(self.drive('1.1', 1, 'healthy')), 0)
+            for poll in range(0, 3600, unhealthy_interval):
+                trends.fold(
+                    'CoffeeTime', self.status(self.drive('1.1', 1, 'dead')), 3600 + poll
+                )
+            trends.fold('CoffeeTime', self.status(self.drive('1.1', 1, 'healthy')), 7200)
+            percentages.append(list(trends.report().values())[-1])
+        self.assertEqual(percentages[0], percentages[1])
+        self.assertIn('50.0% of drive time unhealthy', percentages[0])
+
+    def test_node_with_several_degraded_slots_reported(self) -> None:
+        trends = DeviceTrends()
+        drives = [
+            self.drive('1.1', 1, 'dead'),
+            self.drive('1.2', 1, 'missing'),
+            self.drive('2.1', 2, 'dead'),
+        ]
+        trends.fold('CoffeeTime', self.status(*drives))
+        self.assertIn('Node CoffeeTime/1: 2 degraded slots', trends.report().values())
+        self.assertNotIn('Node CoffeeTime/2: 1 degraded slots', trends.report().values())
+
+    def test_state_is_constant_per_device(self) -> None:
+        trends = DeviceTrends()
+        status = self.status(self.drive('1.1', 1, 'dead'))
+        trends.fold('CoffeeTime', status)
+        drive_fields = set(trends.drives['CoffeeTime/1.1'])
+        for _ in range(50):
+            trends.fold('CoffeeTime', status)
+        self.assertEqual(len(trends.drives), 1)
+        self.assertEqual(len(trends.nodes), 1)
+        self.assertEqual(set(trends.drives['CoffeeTime/1.1']), drive_fields)
+
+    def test_trends_persist_between_runs(self) -> None:
+        trends = DeviceTrends()
+        trends.fold('CoffeeTime', self.status(self.drive('1.1', 1, 'dead')))
+        save_device_trends(trends, 'device_trends_test.json')
+        self.addCleanup(os.remove, 'device_trends_test.json')
+        loaded_trends = load_device_trends('device_trends_test.json')
+        self.assertEqual(vars(loaded_trends), vars(trends))
+        self.assertFalse(os.path.exists('device_trends_test.json.tmp'))
+
+    def test_removed_drives_and_clusters_evicted(self) -> None:
+        trends = DeviceTrends()
+        trends.fold('CoffeeTime', self.status(self.drive('1.1', 1, 'dead')))
+        trends.fold('TeaTime', self.status(self.drive('1.1', 1, 'dead')))
+        trends.fold('CoffeeTime', self.status(self.drive('2.1', 2, 'healthy')))
+        self.assertEqual(set(trends.drives), {'CoffeeTime/2.1', 'TeaTime/1.1'})
+        self.assertEqual(set(trends.nodes), {'CoffeeTime/2', 'TeaTime/1'})
+        trends.retain_clusters(['CoffeeTime'])
+        self.assertEqual(set(trends.drives), {'CoffeeTime/2.1'})
+        self.assertEqual(set(trends.nodes), {'CoffeeTime/2'})
+
+    @mock.patch('cluster_device_monitor.save_device_trends')
+    def test_only_new_findings_printed(self, mock_save: mock.MagicMock) -> None:
+        trends = DeviceTrends()
+        trends.fold('CoffeeTime', self.status(self.drive('1.1', 1, 'dead')))
+        with mock.patch('builtins.print') as mock_print:
+            record_device_trends(trends)
+            printed = mock_print.call_count
+            record_device_trends(trends)
+        self.assertGreater(printed, 0)
+        self.assertEqual(mock_print.call_count, printed)
+        self.assertEqual(trends.findings, list(trends.report()))
+        self.assertEqual(mock_save.call_count, 2)
+
+
+class HealthRulesTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.status: Dict[str, Any] = {
+            'nodes': [{'id': 1, 'node_status': 'online', 'model_number': 'QVIRT'}],
+            'drives': [
+                {'id': '1.1', 'node_id': 1, 'state': 'dead', 'disk_type': 'HDD'},
+                {'id': '1.2', 'node_id': 1, 'state': 'missing', 'disk_type': 'SSD'},
+                {'id': '2.1', 'node_id': 2, 'state': 'healthy', 'disk_type': 'HDD'},
+            ],
+        }
+
+    def test_exclude_filter_skips_replacement_window(self) -> None:
+        rules = compile_health_rules(
+            [
+                {
+                    'devices': 'drives',
+                    'match': {'state': {'not_in': ['healthy']}},
+                    'exclude': {'id': ['1.1']},
+                }
+            ]
+        )
+        alert_data, healthy = check_for_unhealthy_objects(self.status, rules)
+        self.assertEqual(
+            alert_data,
+            {
+                'Event 1': dict(
+                    self.status['drives'][1], severity='critical', rule='rule 1'
+                )
+            },
+        )
+        self.assertFalse(healthy)
+
+    def test_rules_match_any_field(self) -> None:
+        rules = compile_health_rules(
+            [
+                {
+                    'devices': 'drives',
+                    'match': {'node_id': 1, 'disk_type': {'in': ['SSD']}},
+                }
+            ]
+        )
+        alert_data, _healthy = check_for_unhealthy_objects(self.status, rules)
+        self.assertEqual(
+            alert_data,
+            {
+                'Event 1': dict(
+                    self.status['drives'][1], severity='critical', rule='rule 1'
+                )
+            },
+        )
+
+    def test_most_severe_events_first_and_info_does_not_alert(self) -> None:
+        rules = compile_health_rules(
+            [
+                {'devices': 'nodes', 'severity': 'info', 'match': {'id': 1}},
+                {'devices': 'drives', 'severity': 'warning', 'match': {'state': 'dead'}},
+                {
+                    'name': 'replace now',
+                    'devices': 'drives',
+                    'severity': 'critical',
+                    'match': {'id': '1.2'},
+                },
+            ]
+        )
+        alert_data, healthy = check_for_unhealthy_objects(self.status, rules)
+        self.assertEqual(
+            alert_data,
+            {
+                'Event 1': dict(
+                    self.status['drives'][1], severity='critical', rule='replace now'
+                ),
+                'Event 2': dict(
+                    self.status['drives'][0], severity='warning', rule='rule 2'
+                ),
+            },
+        )
+
+        info_only = compile_health_rules(
+            [{'devices': 'nodes', 'severity': 'info', 'match': {'id': 1}}]
+        )
+        self.assertEqual(check_for_unhealthy_objects(self.status, info_only), ({}, True))
+
+    def test_info_matches_become_notices(self) -> None:
+        rules = compile_health_rules(
+            [
+                {
+                    'name': 'watch node',
+                    'devices': 'nodes',
+                    'severity': 'info',
+                    'match': {'id': 1},
+                },
+                {'devices': 'drives', 'match': {'state': 'dead'}},
+            ]
+        )
+        alert_data, notices = check_cluster_health(self.status, rules)
+        self.assertEqual(list(alert_data), ['Event 1'])
+        self.assertEqual(
+            notices, [dict(self.status['nodes'][0], severity='info', rule='watch node')]
+        )
+
+        board = StatusBoard()
+        board.update('CoffeeTime', self.status, alert_data, 0.1, notices)
+        self.assertEqual(board.clusters['CoffeeTime']['notices'], notices)
+        page = board.document('html')[0].decode()
+        self.assertIn('1 active alert(s), 1 notice(s)', page)
+        self.assertIn('Notice (watch node): device 1', page)
+
+    def test_health_rules_load_from_config(self) -> None:
+        config_file = dict(
+            CONFIG,
+            health_rules=[{'devices': 'drives', 'match': {'state': 'dead'}}],
+        )
+        self.assertEqual(validate_config(config_file), [])
+        alert_data, _healthy = check_for_unhealthy_objects(
+            self.status, parse_config(config_file).health_rules
+        )
+        self.assertEqual(
+            alert_data,
+            {
+                'Event 1': dict(
+                    self.status['drives'][0], severity='critical', rule='rule 1'
+                )
+            },
+        )
+
+    def test_invalid_rules_reported(self) -> None:
+        for rule, error in (
+            ({'devices': 'disks'}, 'devices must be "nodes" or "drives"'),
+            ({'devices': 'nodes', 'severity': 'urgent'}, 'severity must be one of'),
+            ({'devices': 'nodes', 'match': {'id': {'equals': 1}}}, 'must use "in"'),
+            ({'devices': 'nodes', 'match': {'id': 1}, 'severty': 'info'}, 'severty'),
+            ({'devices': 'nodes'}, 'match must have at least one condition'),
+            ({'devices': 'nodes', 'match': {}}, 'match must have at least one condition'),
+        ):
+            errors = validate_config(dict(CONFIG, health_rules=[rule]))
+            self.assertEqual(len(errors), 1)
+            self.assertIn(error, errors[0])
+
+
 @mock.patch(
     'cluster_device_monitor.generate_script_problem_email'
 )
@@ -338,6 +1171,17 @@ class BuildEmailTest(unittest.TestCase):
         )
         mock_email.assert_called_once()
 
+    def test_email_contains_severity_and_rule(
+        self, mock_rest: mock.MagicMock, _mock_email: mock.MagicMock
+    ) -> None:
+        alert_data = {
+            'Event 1': dict(
+                self.alert_data['Event 1'], severity='critical', rule='node offline'
+            )
+        }
+        email_alert = populate_alert_email_body(alert_data, mock_rest, CONFIG_DATA)
+        self.assertIn('Event 1: CRITICAL</b> (rule: node offline)', email_alert)
+
     def test_email_contains_alert_data(
         self, mock_rest: mock.MagicMock, _mock_email: mock.MagicMock
     ) -> None:
@@ -348,6 +1192,172 @@ class BuildEmailTest(unittest.TestCase):
         self.assertIn(self.alert_data['Event 1']['model_number'], email_alert)
 
 
+@mock.patch('cluster_device_monitor.RestClient')
+@mock.patch('cluster_device_monitor.EmailMessage.send')
+class ReplaySnapshotsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.replay_dir = 'replay_test'
+        os.mkdir(self.replay_dir)
+        healthy = {'nodes': [{'id': 1, 'node_status': 'online'}], 'drives': []}
+        offline = {
+            'nodes': [
+                {
+                    'id': 1,
+                    'node_status': 'offline',
+                    'model_number': 'QVIRT',
+                    'serial_number': '',
+                }
+            ],
+            'drives': [],
+        }
+        for name, status in (
+            ('001.json', healthy),
+            ('002.json', offline),
+            ('003.json', offline),
+            ('004.json', healthy),
+        ):
+            with open(os.path.join(self.replay_dir, name), 'w') as file:
+                json.dump(status, file)
+        with open(os.path.join(self.replay_dir, 'notes.txt'), 'w') as file:
+            file.write('not a snapshot')
+
+    def test_replay_reports_deduplicated_alerts(
+        self, mock_send: mock.MagicMock, mock_rest: mock.MagicMock
+    ) -> None:
+        alerts, skipped, snapshot_count, elapsed = replay_snapshots(self.replay_dir)
+        self.assertEqual(skipped, [])
+        self.assertEqual(snapshot_count, 4)
+        self.assertEqual(
+            [(name, events) for name, events, _ in alerts], [('002.json', 1)]
+        )
+        self.assertIn('Node Status: offline', alerts[0][2])
+        self.assertGreaterEqual(elapsed, 0)
+        mock_send.assert_not_called()
+        mock_rest.assert_not_called()
+
+    def test_replay_report_includes_throughput(
+        self, _mock_send: mock.MagicMock, _mock_rest: mock.MagicMock
+    ) -> None:
+        with mock.patch('builtins.print') as mock_print:
+            print_replay_report(*replay_snapshots(self.replay_dir))
+        printed = [call[0][0] for call in mock_print.call_args_list]
+        self.assertEqual(
+            printed[0], '002.json: alert with 1 event(s) would have been sent.'
+        )
+        self.assertIn('snapshots/second', printed[1])
+
+    def test_corrupt_snapshot_skipped_and_replay_continues(
+        self, _mock_send: mock.MagicMock, _mock_rest: mock.MagicMock
+    ) -> None:
+        with open(os.path.join(self.replay_dir, '002.json'), 'w') as file:
+            file.write('{"nodes": [')
+        with open(os.path.join(self.replay_dir, '005.snap'), 'wb') as file:
+            file.write(b'not a snapshot')
+        alerts, skipped, snapshot_count, _elapsed = replay_snapshots(self.replay_dir)
+        self.assertEqual([name for name, _error in skipped], ['002.json', '005.snap'])
+        self.assertEqual(snapshot_count, 3)
+        self.assertEqual(
+            [(name, events) for name, events, _ in alerts], [('003.json', 1)]
+        )
+        with mock.patch('builtins.print') as mock_print:
+            print_replay_report(alerts, skipped, snapshot_count, 0.1)
+        printed = [call[0][0] for call in mock_print.call_args_list]
+        self.assertTrue(printed[1].startswith('002.json: skipped invalid snapshot: '))
+        self.assertIn('2 skipped', printed[-1])
+
+    def test_missing_replay_directory_exits(
+        self, _mock_send: mock.MagicMock, _mock_rest: mock.MagicMock
+    ) -> None:
+        with self.assertRaises(SystemExit) as context:
+            main(parse_args(['--replay', 'no_such_replay_dir']))
+        self.assertIn('no_such_replay_dir not found', str(context.exception))
+
+    def tearDown(self) -> None:
+        for name in os.listdir(self.replay_dir):
+            os.remove(os.path.join(self.replay_dir, name))
+        os.rmdir(self.replay_dir)
+
+
+class StatusBoardTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.board = StatusBoard()
+        self.status = {
+            'nodes': [{'id': 1, 'node_status': 'offline', 'model_number': 'QVIRT'}],
+            'drives': [{'id': '1.1', 'state': 'healthy', 'disk_type': 'SSD'}],
+        }
+        self.board.update(
+            'CoffeeTime', self.status, {'Event 1': self.status['nodes'][0]}, 0.5
+        )
+        with mock.patch('builtins.print'):
+            self.server = start_status_server(self.board, 0)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def get(self, path: str, etag: str = '') -> Any:
+        request = urllib.request.Request(self.url + path)
+        if etag:
+            request.add_header('If-None-Match', etag)
+        return urllib.request.urlopen(request)
+
+    def test_json_status(self) -> None:
+        with self.get('/status.json') as response:
+            status = json.load(response)
+        cluster = status['clusters']['CoffeeTime']
+        self.assertFalse(cluster['healthy'])
+        self.assertEqual(cluster['alerts'], [self.status['nodes'][0]])
+        self.assertEqual(cluster['drives'], self.status['drives'])
+        self.assertEqual(cluster['poll_seconds'], 0.5)
+
+    def test_html_status(self) -> None:
+        with self.get('/') as response:
+            page = response.read().decode()
+        self.assertIn('CoffeeTime: UNHEALTHY', page)
+        self.assertIn('<td>offline</td>', page)
+
+    def test_matching_etag_returns_not_modified(self) -> None:
+        with self.get('/status.json') as response:
+            etag = response.headers['ETag']
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.get('/status.json', etag)
+        self.assertEqual(context.exception.code, 304)
+
+    def test_weak_listed_and_wildcard_etags_return_not_modified(self) -> None:
+        with self.get('/status.json') as response:
+            etag = response.headers['ETag']
+        for if_none_match in (f'W/{etag}', f'"stale", {etag}', '*'):
+            with self.assertRaises(urllib.error.HTTPError) as context:
+                self.get('/status.json', if_none_match)
+            self.assertEqual(context.exception.code, 304)
+        with self.get('/status.json', '"stale", W/"other"') as response:
+            self.assertEqual(response.status, 200)
+
+    def test_query_string_is_ignored(self) -> None:
+        with self.get('/status.json?refresh=1') as response:
+            self.assertIn('CoffeeTime', json.load(response)['clusters'])
+        with self.get('/?refresh=1') as response:
+            self.assertIn('CoffeeTime: UNHEALTHY', response.read().decode())
+
+    def test_etag_changes_after_update(self) -> None:
+        _body, etag = self.board.document('json')
+        self.board.update('CoffeeTime', self.status, {}, 0.1)
+        with self.get('/status.json', etag) as response:
+            self.assertNotEqual(response.headers['ETag'], etag)
+            self.assertTrue(json.load(response)['clusters']['CoffeeTime']['healthy'])
+
+    def test_removed_cluster_is_not_served(self) -> None:
+        self.board.remove('CoffeeTime')
+        with self.get('/status.json') as response:
+            self.assertEqual(json.load(response), {'clusters': {}})
+
+    def test_unknown_path_returns_not_found(self) -> None:
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            self.get('/cluster_status.json')
+        self.assertEqual(context.exception.code, 404)
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
 @mock.patch('cluster_device_monitor.EmailMessage.send')
 class GenerateEventAlertEmailTest(unittest.TestCase):
     def test_send_email_success(self, mock_email: mock.MagicMock) -> None:
@@ -362,6 +1372,95 @@ class GenerateEventAlertEmailTest(unittest.TestCase):
             generate_event_alert_email(CONFIG_DATA, 'foo')
 
 
+@mock.patch('cluster_device_monitor.EmailMessage.send')
+class AlertJournalTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.journal = AlertJournal('alert_journal_test.jsonl')
+
+    def test_delivered_alert_is_marked_done(self, mock_email: mock.MagicMock) -> None:
+        generate_event_alert_email(CONFIG_DATA, 'foo', self.journal)
+        mock_email.assert_called_once()
+        self.assertEqual(self.journal.pending(), [])
+
+    def test_failed_alert_stays_pending(self, mock_email: mock.MagicMock) -> None:
+        mock_email.side_effect = Exception()
+        with self.assertRaisesRegex(SystemExit, 'Check connection to SMTP server.'):
+            generate_event_alert_email(CONFIG_DATA, 'foo', self.journal)
+        pending = self.journal.pending()
+        self.assertEqual(len(pending), 1)
+        self.assertEqual(pending[0]['cluster_name'], 'CoffeeTime')
+        self.assertEqual(pending[0]['body'], 'foo')
+
+    def test_replay_sends_pending_and_compacts(self, mock_email: mock.MagicMock) -> None:
+        delivered = self.journal.record_pending('CoffeeTime', 'subject', 'old')
+        self.journal.mark_done(delivered)
+        self.journal.record_pending('CoffeeTime', 'subject', 'lost')
+        with mock.patch('builtins.print'):
+            replay_alert_journal(self.journal, [CONFIG_DATA])
+        mock_email.assert_called_once()
+        self.assertEqual(self.journal.pending(), [])
+        self.assertEqual(os.path.getsize('alert_journal_test.jsonl'), 0)
+
+    def test_replay_keeps_alerts_that_still_fail(
+        self, mock_email: mock.MagicMock
+    ) -> None:
+        mock_email.side_effect = Exception()
+        self.journal.record_pending('CoffeeTime', 'subject', 'lost')
+        self.journal.record_pending('TeaTime', 'subject', 'unknown cluster')
+        with mock.patch('builtins.print'):
+            replay_alert_journal(self.journal, [CONFIG_DATA])
+        self.assertEqual([entry['body'] for entry in self.journal.pending()], ['lost'])
+        with open('alert_journal_test.jsonl', 'r') as file:
+            self.assertEqual(len(file.readlines()), 1)
+
+        with mock.patch('builtins.print'):
+            replay_alert_journal(self.journal, [CONFIG_DATA])
+        mock_email.assert_called_once()
+
+    def test_compact_does_not_create_journal(self, _mock_email: mock.MagicMock) -> None:
+        with mock.patch('builtins.print'):
+            replay_alert_journal(self.journal, [CONFIG_DATA])
+        self.assertFalse(os.path.exists('alert_journal_test.jsonl'))
+
+    @mock.patch('cluster_device_monitor.time.sleep')
+    @mock.patch('cluster_device_monitor.ClusterMonitor.poll')
+    def test_daemon_retries_pending_alerts(
+        self,
+        mock_poll: mock.MagicMock,
+        mock_sleep: mock.MagicMock,
+        mock_email: mock.MagicMock,
+    ) -> None:
+        clock = [1000.0]
+
+        def sleep(seconds: float) -> None:
+            clock[0] += max(seconds, 1.0)
+            if clock[0] > 1000.0 + JOURNAL_RETRY_MIN + 5:
+                raise KeyboardInterrupt()
+
+        self.journal.record_pending('CoffeeTime', 'subject', 'lost')
+        mock_email.side_effect = [Exception(), None]
+        mock_poll.return_value = 60
+        mock_sleep.side_effect = sleep
+        watcher = mock.MagicMock(clusters={'CoffeeTime': CONFIG_DATA})
+        with mock.patch(
+            'cluster_device_monitor.time.monotonic', side_effect=lambda: clock[0]
+        ), mock.patch('builtins.print'), self.assertRaises(KeyboardInterrupt):
+            run_daemon(watcher, 'json', journal=self.journal)
+        self.assertGreater(mock_sleep.call_count, JOURNAL_RETRY_MIN)
+        self.assertEqual(mock_email.call_count, 2)
+        self.assertEqual(self.journal.pending(), [])
+
+    def test_torn_entry_is_ignored(self, _mock_email: mock.MagicMock) -> None:
+        self.journal.record_pending('CoffeeTime', 'subject', 'lost')
+        with open('alert_journal_test.jsonl', 'a') as file:
+            file.write('{"op": "done", "id"')
+        self.assertEqual(len(self.journal.pending()), 1)
+
+    def tearDown(self) -> None:
+        if os.path.exists('alert_journal_test.jsonl'):
+            os.remove('alert_journal_test.jsonl')
+
+
 @mock.patch('cluster_device_monitor.EmailMessage.send')
 class GenerateScriptProblemEmailTest(unittest.TestCase):
     def setUp(self) -> None: